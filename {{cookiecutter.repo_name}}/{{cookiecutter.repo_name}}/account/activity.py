@@ -0,0 +1,77 @@
+# at ./backend/account/activity.py
+import logging
+
+from django.conf import settings
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils import timezone
+
+from ..core.batching import BatchWriter
+from ..core.cache import FallbackCache
+
+logger = logging.getLogger(__name__)
+
+activity_cache = FallbackCache(max_size=settings.ACTIVITY_CACHE_LOCAL_SIZE)
+
+
+def write_last_active(seen):
+    """Set last_active_on of many users with a single UPDATE, seen: {user_id: datetime}."""
+    from .models import User
+
+    if not seen:
+        return 0
+    return User.all_objects.filter(id__in=seen).update(
+        last_active_on=Case(
+            *[When(id=user_id, then=Value(value)) for user_id, value in seen.items()],
+            output_field=DateTimeField()
+        )
+    )
+
+
+class ActivityTracker(BatchWriter):
+    """
+    Coalesce the activity of users into batched last_active_on updates.
+
+    A user is recorded at most once per `interval` seconds, claimed with a
+    cache.add() which every process shares (Redis). Recorded users wait in
+    memory and are written with one UPDATE once `batch_size` of them are
+    pending or `flush_interval` seconds passed.
+    """
+    error_message = "Failed to write the activity of %s users."
+
+    def __init__(self, interval=300, batch_size=500, flush_interval=10):
+        self.interval = interval
+        super().__init__(batch_size=batch_size, flush_interval=flush_interval)
+
+    def new_batch(self):
+        return {}
+
+    def add_to_batch(self, seen, item):
+        user_id, now = item
+        seen[user_id] = now
+
+    def touch(self, user) -> bool:
+        # `user` may be the cached snapshot of the token cache, it's only read.
+        now = timezone.now()
+        if user.last_active_on and (now - user.last_active_on).total_seconds() < self.interval:
+            return False
+        if not activity_cache.add(f'activity:{user.id}', 1, self.interval):
+            return False
+        self.add((user.id, now))
+        return True
+
+    def write_batch(self, seen):
+        write_last_active(seen)
+
+
+_tracker = None
+
+
+def get_activity_tracker():
+    global _tracker
+    if _tracker is None:
+        _tracker = ActivityTracker(
+            interval=settings.ACTIVITY_UPDATE_INTERVAL,
+            batch_size=settings.ACTIVITY_BATCH_SIZE,
+            flush_interval=settings.ACTIVITY_FLUSH_INTERVAL
+        )
+    return _tracker
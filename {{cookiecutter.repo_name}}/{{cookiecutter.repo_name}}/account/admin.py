@@ -1,13 +1,16 @@
 # at matrimony/backend/user/admin.py
-from django.contrib import admin
+from django.contrib import admin, messages
 
-from .models import User, UnitOfHistory, UserDeviceToken
+from .models import User, UnitOfHistory, UserDeviceToken, MailCampaign, MailCampaignFailure
+from ..core.admin import PerformanceModelAdmin
+from ..core.constants import HistoryActions
 
 # Register your models here.
 
 
 @admin.register(User)
-class UserAdmin(admin.ModelAdmin):
+class UserAdmin(PerformanceModelAdmin):
+    # lists deleted users too, the default manager is User.all_objects.
     list_display = [
         'id',
         'username',
@@ -24,19 +27,142 @@ class UserAdmin(admin.ModelAdmin):
         'is_staff',
         'is_deleted',
         'last_active_on',
-        'date_joined',
     ]
+    # LIKE 'x%' can't use the btree unique indexes under a non-C collation, the
+    # prefix searches are served by the gin_trgm_ops indexes instead (from 3
+    # characters on). id is matched in get_search_results.
     search_fields = [
-        'id',
-        'name',
-        'email',
-        'phone',
+        'username__startswith',
+        'email__startswith',
+        'phone__startswith',
     ]
+    date_hierarchy = 'date_joined'
     list_per_page = 20
 
+    def get_search_results(self, request, queryset, search_term):
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if search_term.isdigit():
+            results |= queryset.filter(id=int(search_term))
+        return results, may_have_duplicates
+
     class Meta:
         model = User
 
 
-admin.site.register(UnitOfHistory)
-admin.site.register(UserDeviceToken)
\ No newline at end of file
+class HistoryActionFilter(admin.SimpleListFilter):
+    """Offer the known actions instead of a DISTINCT over the whole table."""
+    title = 'action'
+    parameter_name = 'action'
+
+    def lookups(self, request, model_admin):
+        return HistoryActions.choices
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(action=self.value())
+        return queryset
+
+
+@admin.register(UnitOfHistory)
+class UnitOfHistoryAdmin(PerformanceModelAdmin):
+    list_display = [
+        'id',
+        'action',
+        'user',
+        'perform_for',
+        'content_type',
+        'object_id',
+        'created',
+    ]
+    list_filter = [
+        HistoryActionFilter,
+    ]
+    list_select_related = [
+        'user',
+        'perform_for',
+        'content_type',
+    ]
+    raw_id_fields = [
+        'user',
+        'perform_for',
+        'user_agent',
+    ]
+    date_hierarchy = 'created'
+    list_per_page = 50
+
+
+@admin.register(UserDeviceToken)
+class UserDeviceTokenAdmin(PerformanceModelAdmin):
+    list_display = [
+        'user',
+        'device_type',
+        'updated',
+    ]
+    list_filter = [
+        'device_type',
+    ]
+    list_select_related = [
+        'user',
+    ]
+    raw_id_fields = [
+        'user',
+    ]
+    list_per_page = 50
+
+
+@admin.register(MailCampaign)
+class MailCampaignAdmin(admin.ModelAdmin):
+    list_display = [
+        'id',
+        'subject',
+        'status',
+        'recipient_count',
+        'sent_count',
+        'failed_count',
+        'created',
+    ]
+    list_filter = [
+        'status',
+    ]
+    readonly_fields = [
+        'status',
+        'last_user_id',
+        'recipient_count',
+        'sent_count',
+        'failed_count',
+    ]
+    actions = [
+        'start_campaigns',
+    ]
+
+    @admin.action(description='Send (or resume stalled) selected campaigns')
+    def start_campaigns(self, request, queryset):
+        campaigns = list(queryset)
+        started = sum(campaign.start() for campaign in campaigns)
+        if started:
+            self.message_user(request, f'{started} campaign(s) queued.', messages.SUCCESS)
+        if started < len(campaigns):
+            self.message_user(
+                request,
+                f'{len(campaigns) - started} campaign(s) skipped, they are running or completed.',
+                messages.WARNING
+            )
+
+
+@admin.register(MailCampaignFailure)
+class MailCampaignFailureAdmin(PerformanceModelAdmin):
+    list_display = [
+        'id',
+        'campaign',
+        'email',
+        'error',
+        'created',
+    ]
+    list_select_related = [
+        'campaign',
+    ]
+    raw_id_fields = [
+        'campaign',
+        'user',
+    ]
+    list_per_page = 50
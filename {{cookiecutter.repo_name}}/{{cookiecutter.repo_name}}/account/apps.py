@@ -5,3 +5,10 @@ class AccountConfig(AppConfig):
     name = '{{cookiecutter.repo_name}}.account'
     label = 'account'
     verbose_name = "Accounts"
+
+    def ready(self):
+        from django.db.models.signals import post_save
+
+        from .authentication import invalidate_saved_user
+
+        post_save.connect(invalidate_saved_user, sender=self.get_model('User'))
@@ -0,0 +1,95 @@
+# at ./backend/account/authentication.py
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from ..core.cache import FallbackCache
+
+token_cache = FallbackCache(max_size=settings.TOKEN_CACHE_LOCAL_SIZE)
+
+# the User columns kept in the cache, enough for authentication and the
+# permission checks. The password hash and the profile are never cached.
+CACHED_USER_FIELDS = (
+    'id',
+    'username',
+    'is_active',
+    'is_staff',
+    'is_superuser',
+    'last_active_on',
+)
+
+
+def token_key(key):
+    return f'auth-token:{key}'
+
+
+def user_token_key(user_id):
+    return f'auth-token-user:{user_id}'
+
+
+def drop_cached_tokens(user_ids):
+    keys = []
+    for user_id in user_ids:
+        keys.append(user_token_key(user_id))
+        key = token_cache.get(user_token_key(user_id))
+        if key:
+            keys.append(token_key(key))
+    if keys:
+        token_cache.delete_many(keys)
+
+
+def invalidate_token_cache(*user_ids):
+    """
+    Drop cached token snapshots of the given users once the current
+    transaction commits, call it after the write. Dropped any earlier, a
+    concurrent request could cache the old row again.
+    """
+    transaction.on_commit(lambda: drop_cached_tokens(user_ids))
+
+
+def get_snapshot(user) -> dict:
+    return {name: getattr(user, name) for name in CACHED_USER_FIELDS}
+
+
+def from_snapshot(snapshot):
+    """A User with the cached columns loaded, the others are deferred."""
+    from .models import User
+
+    fields = User._meta.concrete_fields
+    names = [field.attname for field in fields if field.attname in snapshot]
+    return User.from_db(DEFAULT_DB_ALIAS, names, [snapshot[name] for name in names])
+
+
+def invalidate_saved_user(sender, instance, created, **kwargs):
+    """post_save of User, every save may change what the cached snapshot shows."""
+    if not created:
+        invalidate_token_cache(instance.id)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication which keeps a snapshot of the token's user in the
+    cache, so authenticated requests don't run the Token JOIN User query.
+    The snapshot holds CACHED_USER_FIELDS only, other fields of request.user
+    are loaded from the database when they are read.
+    Snapshots expire after TOKEN_CACHE_TIMEOUT seconds and are dropped with
+    invalidate_token_cache() whenever the token changes or the user is saved.
+    Writes through QuerySet.update() don't send post_save, they have to call
+    it themselves.
+    """
+
+    def authenticate_credentials(self, key):
+        snapshot = token_cache.get(token_key(key))
+        if snapshot is None:
+            user, token = super().authenticate_credentials(key)
+            timeout = settings.TOKEN_CACHE_TIMEOUT
+            token_cache.set(token_key(key), get_snapshot(user), timeout)
+            token_cache.set(user_token_key(user.id), key, timeout)
+            return user, token
+        user = from_snapshot(snapshot)
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        return user, Token(key=key, user=user)
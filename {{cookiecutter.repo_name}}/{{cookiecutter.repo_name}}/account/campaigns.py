@@ -0,0 +1,115 @@
+# at ./backend/account/campaigns.py
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .choices import CampaignStatusChoices
+from .models import MailCampaign, MailCampaignDelivery, MailCampaignFailure, User
+from ..core.utils import chunked
+from ..mail import build_message, get_cleaned_emails, render_many, transport
+
+logger = logging.getLogger(__name__)
+
+
+def complete_campaign(campaign_id):
+    """Mark the campaign completed once every queued recipient was handled."""
+    return MailCampaign.objects.filter(
+        id=campaign_id,
+        status=CampaignStatusChoices.DISPATCHED,
+        recipient_count__lte=F('sent_count') + F('failed_count')
+    ).update(status=CampaignStatusChoices.COMPLETED, updated=timezone.now())
+
+
+def dispatch_campaign(campaign_id, on_chunk):
+    """
+    Stream the recipient ids of a campaign taken by MailCampaign.start()
+    and hand them to `on_chunk` in chunks of MAIL_CAMPAIGN_CHUNK_SIZE.
+    Progress is saved after every chunk, `updated` tells start() whether
+    the campaign stalled.
+    """
+    campaign = MailCampaign.objects.get(id=campaign_id)
+    if campaign.status != CampaignStatusChoices.SENDING:
+        return
+    recipient_ids = campaign.get_recipients().filter(
+        id__gt=campaign.last_user_id
+    ).order_by('id').values_list('id', flat=True).iterator(chunk_size=2000)
+    for chunk in chunked(recipient_ids, settings.MAIL_CAMPAIGN_CHUNK_SIZE):
+        on_chunk(campaign_id, chunk)
+        MailCampaign.objects.filter(id=campaign_id).update(
+            last_user_id=chunk[-1],
+            recipient_count=F('recipient_count') + len(chunk),
+            updated=timezone.now()
+        )
+    MailCampaign.objects.filter(id=campaign_id).update(
+        status=CampaignStatusChoices.DISPATCHED,
+        updated=timezone.now()
+    )
+    complete_campaign(campaign_id)
+
+
+def get_recipient_context(campaign, user):
+    return {
+        **campaign.context,
+        'username': user.username,
+        'full_name': user.name or user.username,
+        'email': user.email,
+    }
+
+
+def send_campaign_chunk(campaign_id, user_ids):
+    """
+    Render and send one mail per recipient over the shared SMTP connection.
+    Handled recipients are recorded with the counts, a chunk delivered again
+    (acks_late, a resumed campaign) skips them instead of sending twice.
+    """
+    campaign = MailCampaign.objects.get(id=campaign_id)
+    handled = set(campaign.deliveries.filter(
+        recipient_id__in=user_ids
+    ).values_list('recipient_id', flat=True))
+    user_ids = [user_id for user_id in user_ids if user_id not in handled]
+    if not user_ids:
+        complete_campaign(campaign_id)
+        return
+    users = list(User.objects.filter(id__in=user_ids).only('id', 'username', 'name', 'email'))
+    valid_emails = set(get_cleaned_emails([user.email for user in users]))
+    failures = [
+        MailCampaignFailure(
+            campaign_id=campaign_id, user_id=user.id, email=user.email, error='Invalid email'
+        )
+        for user in users if user.email not in valid_emails
+    ]
+    users = [user for user in users if user.email in valid_emails]
+    rendered = render_many(
+        campaign.template, [get_recipient_context(campaign, user) for user in users]
+    )
+    messages = [
+        build_message(campaign.subject, html, to=[user.email], text=text)
+        for user, (text, html) in zip(users, rendered)
+    ]
+    results = transport.send_messages(messages)
+    failures += [
+        MailCampaignFailure(
+            campaign_id=campaign_id, user_id=user.id, email=user.email, error=result.error or ''
+        )
+        for user, result in zip(users, results) if not result.sent
+    ]
+    sent_ids = {user.id for user, result in zip(users, results) if result.sent}
+    with transaction.atomic():
+        MailCampaignDelivery.objects.bulk_create([
+            MailCampaignDelivery(
+                campaign_id=campaign_id, recipient_id=user_id, sent=user_id in sent_ids
+            )
+            for user_id in user_ids
+        ])
+        MailCampaignFailure.objects.bulk_create(failures)
+        # recipients which no longer exist count as failed, without a failure row.
+        MailCampaign.objects.filter(id=campaign_id).update(
+            sent_count=F('sent_count') + len(sent_ids),
+            failed_count=F('failed_count') + len(user_ids) - len(sent_ids),
+            updated=timezone.now()
+        )
+    complete_campaign(campaign_id)
+    logger.info("Campaign %s: sent %s of %s mails.", campaign_id, len(sent_ids), len(user_ids))
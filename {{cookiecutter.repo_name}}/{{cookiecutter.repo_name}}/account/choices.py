@@ -10,4 +10,11 @@ class GenderChoices(models.TextChoices):
 class DeviceTypeChoices(models.TextChoices):
     IOS = "ios"
     ANDROID = "android"
-    WEB = "web"
\ No newline at end of file
+    WEB = "web"
+
+
+class CampaignStatusChoices(models.TextChoices):
+    PENDING = "pending"
+    SENDING = "sending"  # recipients are being dispatched to workers
+    DISPATCHED = "dispatched"  # every recipient is queued
+    COMPLETED = "completed"
@@ -1,24 +1,53 @@
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db.models import Q
+from django.db.models.functions import Greatest
 from django_filters import rest_framework as filters
 
 from .models import User
 from ..core.filters import BaseOrderBy
 
+# columns covered by the gin_trgm_ops indexes on User.
+SEARCH_FIELDS = ('username', 'name', 'email', 'phone')
+
 
 class UserFilter(BaseOrderBy):
+    q = filters.CharFilter(
+        method='search_filter'
+    )
+    # substring filters, served by the same trigram indexes.
     phone = filters.CharFilter(
         field_name='phone',
-        lookup_expr='icontains'
+        lookup_expr='trigram_icontains'
     )
     name = filters.CharFilter(
-        field_name='full_name',
-        lookup_expr='icontains'
+        field_name='name',
+        lookup_expr='trigram_icontains'
     )
     email = filters.CharFilter(
         field_name='email',
-        lookup_expr='icontains'
+        lookup_expr='trigram_icontains'
+    )
+    # the user list is keyset paginated, which can't order by the nullable
+    # name and last_active_on.
+    ordering_fields = (
+        'id',
+        'username',
+        'email',
+        'date_joined',
     )
 
     class Meta:
         model = User
         fields = ['id', 'phone', 'username', 'name', 'email', 'is_active']
 
+    def search_filter(self, qs, name, value):
+        """
+        Ranked search over SEARCH_FIELDS.
+        The `<%` (word similarity) operator is answered by the trigram
+        indexes, best matches come first.
+        """
+        condition = Q()
+        for field in SEARCH_FIELDS:
+            condition |= Q(**{f'{field}__trigram_word_similar': value})
+        rank = Greatest(*[TrigramWordSimilarity(value, field) for field in SEARCH_FIELDS])
+        return qs.filter(condition).annotate(rank=rank).order_by('-rank', 'pk')
@@ -0,0 +1,123 @@
+# at ./backend/account/hashers.py
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class TunedArgon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """Argon2 with the cost set in settings, passwords hashed with other
+    parameters are rehashed on the next successful login."""
+    time_cost = settings.ARGON2_TIME_COST
+    memory_cost = settings.ARGON2_MEMORY_COST  # KiB
+    parallelism = settings.ARGON2_PARALLELISM
+
+
+class TunedScryptPasswordHasher(hashers.ScryptPasswordHasher):
+    work_factor = settings.SCRYPT_WORK_FACTOR
+
+
+def setup_worker():
+    # workers aren't forked from the web worker, they start without a
+    # configured django. This module is imported before, so it can't
+    # import models.
+    django.setup()
+
+
+def make_many(passwords, hasher):
+    return [hashers.make_password(password, hasher=hasher) for password in passwords]
+
+
+def get_pool_context():
+    # forking a threaded web worker copies locks held by other threads and
+    # its open connections, the pool starts clean processes instead.
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context('spawn')
+
+
+class PasswordHashingService:
+    """
+    Hash passwords inline (workers=0) or in a process pool, so the CPU
+    heavy hashing doesn't hold the GIL of a threaded web worker. At most
+    `max_pending` hashes wait for the pool, further callers block.
+    """
+
+    def __init__(self, workers=0, max_pending=None):
+        self.workers = workers
+        self.pool = None
+        self.pid = None
+        self.lock = threading.Lock()
+        self.pending = threading.BoundedSemaphore(max_pending or max(workers, 1) * 4)
+
+    def get_pool(self):
+        with self.lock:
+            if self.pool is None or self.pid != os.getpid():
+                # a pool inherited from the parent process can't be used.
+                self.pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=get_pool_context(),
+                    initializer=setup_worker
+                )
+                self.pid = os.getpid()
+            return self.pool
+
+    def make_password(self, password):
+        if not self.workers or password is None:
+            return hashers.make_password(password)
+        with self.pending:
+            return self.get_pool().submit(hashers.make_password, password).result()
+
+    def make_passwords(self, passwords, hasher='default'):
+        """
+        Hash many passwords, spread over every worker in chunks. Like
+        make_password, every chunk submitted to the pool takes a pending
+        slot until it is hashed.
+        """
+        if not self.workers:
+            return make_many(passwords, hasher)
+        passwords = list(passwords)
+        chunksize = max(1, len(passwords) // (self.workers * 4))
+        futures = []
+        for start in range(0, len(passwords), chunksize):
+            self.pending.acquire()
+            try:
+                future = self.get_pool().submit(
+                    make_many, passwords[start:start + chunksize], hasher
+                )
+            except BaseException:
+                self.pending.release()
+                raise
+            future.add_done_callback(lambda future: self.pending.release())
+            futures.append(future)
+        return [password for future in futures for password in future.result()]
+
+    def shutdown(self):
+        with self.lock:
+            if self.pool is not None and self.pid == os.getpid():
+                self.pool.shutdown()
+            self.pool = None
+
+
+_service = None
+
+
+def get_hashing_service():
+    global _service
+    if _service is None:
+        _service = PasswordHashingService(
+            workers=settings.PASSWORD_HASHING_WORKERS,
+            max_pending=settings.PASSWORD_HASHING_MAX_PENDING
+        )
+    return _service
+
+
+def set_password(user, raw_password):
+    """User.set_password through the hashing service."""
+    user.password = get_hashing_service().make_password(raw_password)
+    # lets AbstractBaseUser.save() notify the password validators.
+    user._password = raw_password
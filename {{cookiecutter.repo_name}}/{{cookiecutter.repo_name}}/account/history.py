@@ -0,0 +1,125 @@
+# at ./backend/account/history.py
+import logging
+from collections import deque
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+
+from ..core.batching import BatchWriter
+
+logger = logging.getLogger(__name__)
+
+
+def extract_headers(meta):
+    """
+    Keep only the allow-listed request headers (settings.HISTORY_HEADERS),
+    cut every value to HISTORY_HEADER_MAX_LENGTH characters.
+    """
+    max_length = settings.HISTORY_HEADER_MAX_LENGTH
+    headers = {
+        name: str(meta[name])[:max_length]
+        for name in settings.HISTORY_HEADERS
+        if meta.get(name)
+    }
+    return headers or None
+
+
+def build_history(entries) -> list:
+    """Unsaved UnitOfHistory rows of the entries, with their user agents interned."""
+    from .models import UnitOfHistory, UserAgent
+
+    entries = [dict(entry) for entry in entries]
+    user_agents = UserAgent.objects.intern(
+        entry['user_agent'] for entry in entries if entry.get('user_agent')
+    )
+    for entry in entries:
+        entry['user_agent_id'] = user_agents.get(entry.pop('user_agent', None))
+    return [UnitOfHistory(**entry) for entry in entries]
+
+
+def insert_history(rows) -> list:
+    from .models import UnitOfHistory
+
+    with transaction.atomic():
+        rows = UnitOfHistory.objects.bulk_create(rows, batch_size=settings.HISTORY_BATCH_SIZE)
+        # foreign keys are only checked on commit, check them while the
+        # savepoint can still be rolled back.
+        connection.check_constraints(table_names=[UnitOfHistory._meta.db_table])
+    return rows
+
+
+def write_history(entries) -> list:
+    """
+    Insert a batch of history entries with a single bulk_create. When the
+    batch fails, e.g. on the user of an entry which was deleted meanwhile,
+    the entries are inserted one by one and only the failing ones are lost.
+    """
+    rows = build_history(entries)
+    try:
+        return insert_history(rows)
+    except IntegrityError:
+        logger.warning("History batch of %s entries failed, writing them one by one.", len(rows))
+    written = []
+    for row in rows:
+        # the ids of the rolled back insert.
+        row.pk = None
+        try:
+            written += insert_history([row])
+        except IntegrityError:
+            logger.exception("Dropped a history entry which can't be written.")
+    return written
+
+
+class HistoryWriter(BatchWriter):
+    """Collect UnitOfHistory entries and write them in batches.
+
+    sync:   every entry is inserted immediately (used in tests).
+    buffer: entries wait in an in-process ring buffer and are flushed with
+            bulk_create once the batch is full or the flush interval passed.
+    celery: same buffer, but every batch is handed to a celery worker.
+    """
+    error_message = "Failed to write %s history entries."
+
+    def __init__(self, mode='buffer', batch_size=100, flush_interval=5, max_size=10000):
+        self.mode = mode
+        self.max_size = max_size
+        super().__init__(batch_size=batch_size, flush_interval=flush_interval)
+
+    def new_batch(self):
+        return deque(maxlen=self.max_size)
+
+    def add_to_batch(self, batch, entry):
+        if len(batch) == batch.maxlen:
+            logger.warning("History buffer is full, dropping the oldest entry.")
+        batch.append(entry)
+
+    def write(self, entry):
+        from .models import UnitOfHistory
+
+        if self.mode == 'sync':
+            # part of the caller's transaction.
+            return UnitOfHistory.objects.bulk_create(build_history([entry]))[0]
+        # entries of a transaction which is rolled back are never buffered.
+        transaction.on_commit(lambda: self.add(entry))
+
+    def write_batch(self, entries):
+        if self.mode == 'celery':
+            from .tasks import write_history_on_delay
+            write_history_on_delay.delay(list(entries))
+        else:
+            write_history(entries)
+
+
+_writer = None
+
+
+def get_history_writer():
+    global _writer
+    if _writer is None:
+        _writer = HistoryWriter(
+            mode=settings.HISTORY_WRITER,
+            batch_size=settings.HISTORY_BATCH_SIZE,
+            flush_interval=settings.HISTORY_FLUSH_INTERVAL,
+            max_size=settings.HISTORY_BUFFER_SIZE
+        )
+    return _writer
@@ -0,0 +1,41 @@
+# at ./backend/account/lookups.py
+from django.db.models.functions import Lower
+
+from .models import User
+
+EMAIL = 'email'
+PHONE = 'phone'
+USERNAME = 'username'
+
+
+def resolve_identifier(identifier):
+    """
+    Tell which user column a sign-in identifier belongs to.
+    usernames must start with a letter (see username_validator), so
+    anything containing "@" is an email and anything matching
+    User.phone_regex is a phone number.
+    """
+    if '@' in identifier:
+        return EMAIL
+    if User.phone_regex.regex.match(identifier):
+        return PHONE
+    return USERNAME
+
+
+def filter_by_email(queryset, email):
+    """Case insensitive email match, served by the Lower("email") index
+    for live users (User.objects)."""
+    return queryset.alias(email_lower=Lower('email')).filter(email_lower=email.lower())
+
+
+def get_user_by_identifier(identifier, queryset=None):
+    """Fetch a user by email, phone or username with one indexed lookup."""
+    queryset = User.objects.all() if queryset is None else queryset
+    kind = resolve_identifier(identifier)
+    if kind == EMAIL:
+        try:
+            return filter_by_email(queryset, identifier).get()
+        except User.MultipleObjectsReturned:
+            # rows that only differ by case, fall back to the exact address.
+            return queryset.get(email=identifier)
+    return queryset.get(**{kind: identifier})
@@ -0,0 +1,64 @@
+import os
+import time
+
+from django.contrib.auth.hashers import get_hashers
+from django.core.management.base import BaseCommand
+
+from ...hashers import PasswordHashingService
+
+
+class Command(BaseCommand):
+    help = "Time the configured password hashers inline and in process pools of several sizes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hashers',
+            nargs='+',
+            help="Algorithms to measure, e.g. argon2 scrypt. "
+                 "Defaults to every PASSWORD_HASHERS entry."
+        )
+        parser.add_argument(
+            '--workers',
+            nargs='+',
+            type=int,
+            default=[1, 2, os.cpu_count()],
+            help="Pool sizes to measure the throughput of."
+        )
+        parser.add_argument(
+            '--count',
+            type=int,
+            default=32,
+            help="Passwords hashed per measurement."
+        )
+
+    def measure(self, algorithm, workers, count):
+        """Hashes per second."""
+        service = PasswordHashingService(workers=workers)
+        passwords = [f'password-{i}' for i in range(count)]
+        try:
+            # the first call starts the worker processes.
+            service.make_passwords(passwords[:max(workers, 1)], algorithm)
+            start = time.perf_counter()
+            service.make_passwords(passwords, algorithm)
+            return count / (time.perf_counter() - start)
+        finally:
+            service.shutdown()
+
+    def handle(self, *args, **options):
+        algorithms = options['hashers'] or [hasher.algorithm for hasher in get_hashers()]
+        count = options['count']
+        workers = sorted(set(options['workers']))
+        self.stdout.write(
+            f"{count} passwords per run on {os.cpu_count()} cpus, hashes per second:"
+        )
+        self.stdout.write(
+            f"{'hasher':<16}{'ms/hash':>10}{'inline':>10}"
+            + ''.join(f"{f'{n} workers':>12}" for n in workers)
+        )
+        for algorithm in algorithms:
+            inline = self.measure(algorithm, 0, count)
+            rates = [self.measure(algorithm, n, count) for n in workers]
+            self.stdout.write(
+                f"{algorithm:<16}{1000 / inline:>10.1f}{inline:>10.1f}"
+                + ''.join(f"{rate:>12.1f}" for rate in rates)
+            )
@@ -0,0 +1,74 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.template import engines
+
+from ....mail import build_message, get_compiled_template, get_text_template, html_to_text
+
+# a newsletter sized mail, used when no --template is given.
+SAMPLE_TEMPLATE = """{% raw %}<html>
+<head><style type="text/css">
+  body { font-family: sans-serif; }
+  .button { background: #1a73e8; color: #fff; }
+</style></head>
+<body>
+  <p>Hello {{ full_name }},</p>
+  {% for item in items %}
+  <h2>{{ item.title }}</h2>
+  <p>{{ item.body }} &mdash; <a class="button" href="{{ item.url }}">Read more</a></p>
+  {% endfor %}
+  <p>Sent to {{ email }}, <a href="https://example.com/unsubscribe">unsubscribe</a>.</p>
+</body>
+</html>{% endraw %}"""
+
+
+class Command(BaseCommand):
+    help = "Time the CPU cost of one campaign mail: render, text part and MIME message."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--template', help="Mail template, a built-in sample by default.")
+        parser.add_argument('--count', type=int, default=2000, help="Mails to build.")
+
+    def get_templates(self, name):
+        if name:
+            return get_compiled_template(name), get_text_template(name)
+        return engines['django'].from_string(SAMPLE_TEMPLATE), None
+
+    def get_context(self, i, items):
+        return {
+            'items': items,
+            'username': f'user{i}',
+            'full_name': f'User {i}',
+            'email': f'user{i}@example.com',
+        }
+
+    def handle(self, *args, **options):
+        template, text_template = self.get_templates(options['template'])
+        count = options['count']
+        items = [
+            {'title': f'Story {i}', 'body': 'Lorem ipsum dolor sit amet. ' * 8, 'url': f'/{i}'}
+            for i in range(5)
+        ]
+        timings = {'render': 0, 'text part': 0, 'message': 0}
+        size = 0
+        for i in range(count):
+            context = self.get_context(i, items)
+            start = time.perf_counter()
+            html = template.render(context)
+            rendered = time.perf_counter()
+            text = text_template.render(context) if text_template else html_to_text(html)
+            converted = time.perf_counter()
+            # the MIME message is serialized by send_messages before it goes to SMTP.
+            message = build_message('News', html, to=[context['email']], text=text)
+            size += len(message.message().as_bytes())
+            built = time.perf_counter()
+            timings['render'] += rendered - start
+            timings['text part'] += converted - rendered
+            timings['message'] += built - converted
+        total = sum(timings.values())
+        self.stdout.write(f"{count} mails of {size // count} bytes, per mail:")
+        for name, elapsed in timings.items():
+            self.stdout.write(f"{name:<12}{elapsed / count * 1e6:>10.1f} us")
+        self.stdout.write(
+            f"{'total':<12}{total / count * 1e6:>10.1f} us, {count / total:.0f} mails/s per core"
+        )
@@ -0,0 +1,83 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from rest_framework.pagination import Cursor
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from ...models import User
+from ....core.paginations import KeysetPagination, LimitPagination
+from ....core.utils import chunked
+
+
+class Command(BaseCommand):
+    help = "Time the first, middle and last page of the user list, keyset against offset."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100000, help="Users to create.")
+        parser.add_argument('--limit', type=int, default=20, help="Page size.")
+        parser.add_argument('--repeat', type=int, default=50, help="Runs per page.")
+        parser.add_argument('--keep', action='store_true', help="Keep the created users.")
+
+    def seed(self, prefix, count):
+        users = (
+            User(username=f'{prefix}{i}', email=f'{prefix}{i}@example.com', password='!')
+            for i in range(count)
+        )
+        for batch in chunked(users, 5000):
+            User.objects.bulk_create(batch)
+
+    def keyset_url(self, after_id, limit):
+        """The url of the page after user `after_id`, as the paginator links it."""
+        paginator = KeysetPagination()
+        paginator.base_url = f'http://testserver/api/v1/users/?limit={limit}'
+        if after_id is None:
+            return paginator.base_url
+        cursor = Cursor(offset=0, reverse=False, position=str(after_id))
+        return paginator.encode_cursor(cursor)
+
+    def measure(self, name, paginator_class, url, repeat):
+        request = Request(APIRequestFactory().get(url))
+        paginator_class().paginate_queryset(User.objects.all(), request)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            # a new paginator per run, like one request each.
+            paginator_class().paginate_queryset(User.objects.all(), request)
+        elapsed = (time.perf_counter() - start) / repeat * 1000
+        self.stdout.write(f"{name:<24}{elapsed:>10.3f} ms")
+
+    def handle(self, *args, **options):
+        prefix = f'bench{uuid.uuid4().hex[:6]}p'
+        count, limit, repeat = options['users'], options['limit'], options['repeat']
+        start = time.perf_counter()
+        self.seed(prefix, count)
+        self.stdout.write(f"created {count} users in {time.perf_counter() - start:.1f}s")
+        try:
+            total = User.objects.count()
+            ids = User.objects.order_by('id').values_list('id', flat=True)
+            self.stdout.write(f"{'page of ' + str(total):<24}{'per run':>13}")
+            # the paginators build their links from the request's host.
+            pages = (('first', 0), ('middle', total // 2), ('last', total - limit))
+            with override_settings(ALLOWED_HOSTS=['testserver']):
+                for page, offset in pages:
+                    after_id = ids[offset - 1] if offset else None
+                    self.measure(
+                        f"keyset, {page}",
+                        KeysetPagination,
+                        self.keyset_url(after_id, limit),
+                        repeat
+                    )
+                    # LimitPagination also runs the COUNT(*) for every page.
+                    self.measure(
+                        f"offset, {page}",
+                        LimitPagination,
+                        f'/api/v1/users/?limit={limit}&start={offset}',
+                        repeat
+                    )
+        finally:
+            if not options['keep']:
+                seeded = User.objects.filter(username__startswith=prefix)
+                for batch in chunked(seeded.values_list('id', flat=True), 5000):
+                    User.all_objects.filter(id__in=batch).delete()
@@ -0,0 +1,94 @@
+import random
+import re
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from ...filters import UserFilter
+from ...models import User
+from ....core.utils import chunked
+
+SYLLABLES = ('ka', 'ri', 'mo', 'sa', 'lu', 'ne', 'to', 'vi', 'da', 'ha', 'ji', 'po', 'ze')
+
+
+class Command(BaseCommand):
+    help = "Time the trigram indexed user search and filters against plain icontains."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100000, help="Users to create.")
+        parser.add_argument('--repeat', type=int, default=20, help="Runs per query.")
+        parser.add_argument('--keep', action='store_true', help="Keep the created users.")
+
+    def make_name(self, rand):
+        return ' '.join(
+            ''.join(rand.choice(SYLLABLES) for _ in range(rand.randint(2, 4))).title()
+            for _ in range(2)
+        )
+
+    def seed(self, prefix, count):
+        rand = random.Random(count)
+        users = (
+            User(
+                username=f'{prefix}{i}',
+                name=self.make_name(rand),
+                email=f'{prefix}{i}@example.com',
+                phone=f'+1{i:010d}',
+                password='!',
+            )
+            for i in range(count)
+        )
+        for batch in chunked(users, 5000):
+            User.objects.bulk_create(batch)
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {User._meta.db_table}')
+
+    def measure(self, name, queryset, repeat):
+        match = re.search(r'Index (?:Only )?Scan (?:using|on) (\w+)', queryset.explain())
+        list(queryset.all())
+        start = time.perf_counter()
+        for _ in range(repeat):
+            # .all() clones, the result cache of `queryset` stays empty.
+            list(queryset.all())
+        elapsed = (time.perf_counter() - start) / repeat * 1000
+        index = match.group(1) if match else 'seq scan'
+        self.stdout.write(f"{name:<28}{elapsed:>10.3f} ms   {index}")
+
+    def handle(self, *args, **options):
+        prefix = f'bench{uuid.uuid4().hex[:6]}s'
+        count, repeat = options['users'], options['repeat']
+        start = time.perf_counter()
+        self.seed(prefix, count)
+        self.stdout.write(f"created {count} users in {time.perf_counter() - start:.1f}s")
+        try:
+            target = User.objects.get(username=f'{prefix}{count // 2}')
+            # substrings of one user, rare enough that a scan reads the whole table.
+            terms = {
+                'name': target.name.split()[1][1:6],
+                'email': f'{target.username}@',
+                'phone': target.phone[-7:],
+            }
+            self.stdout.write(f"terms: {terms}")
+            self.stdout.write(f"{'query':<28}{'per run':>13}   index")
+            self.measure(
+                "ranked search (q)",
+                UserFilter(data={'q': target.name}, queryset=User.objects.all()).qs[:20],
+                repeat
+            )
+            for field, term in terms.items():
+                self.measure(
+                    f"{field} icontains",
+                    User.objects.filter(**{f'{field}__icontains': term})[:20],
+                    repeat
+                )
+                self.measure(
+                    f"{field} filter (trigram)",
+                    UserFilter(data={field: term}, queryset=User.objects.all()).qs[:20],
+                    repeat
+                )
+        finally:
+            if not options['keep']:
+                seeded = User.objects.filter(username__startswith=prefix)
+                for batch in chunked(seeded.values_list('id', flat=True), 5000):
+                    User.all_objects.filter(id__in=batch).delete()
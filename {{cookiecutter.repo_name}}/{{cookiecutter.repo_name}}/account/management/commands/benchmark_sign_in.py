@@ -0,0 +1,106 @@
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+
+from ...models import User
+from ...views import UserViewSet
+from ....core.batching import flush_batch_writers
+from ....core.throttling import IPThrottle, UsernameThrottle
+from ....core.utils import chunked
+
+
+class Command(BaseCommand):
+    help = "Measure sign-ins per second through the sign-in view from several threads."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads',
+            nargs='+',
+            type=int,
+            default=[1, os.cpu_count()],
+            help="Concurrent sign-ins to measure the throughput of."
+        )
+        parser.add_argument('--count', type=int, default=100, help="Sign-ins per run.")
+        parser.add_argument('--keep', action='store_true', help="Keep the created users.")
+
+    def get_view(self):
+        # the action's permissions and throttles, as the router builds it; the
+        # session is saved by the middleware.
+        view = UserViewSet.as_view({'post': 'sign_in'}, **UserViewSet.sign_in.kwargs)
+        return SessionMiddleware(view)
+
+    def sign_in(self, view, factory, username, password):
+        request = factory.post(
+            '/api/v1/users/sign-in/',
+            {'username': username, 'password': password},
+            format='json',
+            REMOTE_ADDR='10.0.0.1'
+        )
+        response = view(request)
+        if response.status_code != 201:
+            raise CommandError(f"Sign in failed with {response.status_code}: {response.data}")
+
+    def measure(self, usernames, password, threads, count):
+        """Sign-ins per second."""
+        view, factory = self.get_view(), APIRequestFactory()
+
+        def task(index):
+            try:
+                # every thread signs in its own users, one after the other.
+                for i in range(index, count, threads):
+                    self.sign_in(view, factory, usernames[i % len(usernames)], password)
+            finally:
+                # every thread has its own database connection.
+                connection.close()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(task, range(threads)))
+        return count / (time.perf_counter() - start)
+
+    def handle(self, *args, **options):
+        count = options['count']
+        threads = sorted(set(options['threads']))
+        prefix = f'bench{uuid.uuid4().hex[:6]}u'
+        password = uuid.uuid4().hex
+        # the throttles would reject all but the first few sign-ins.
+        for throttle_class in (IPThrottle, UsernameThrottle):
+            throttle_class.THROTTLE_RATES = {
+                **throttle_class.THROTTLE_RATES,
+                f'sign_in.{throttle_class.key_name}': f'{count * len(threads) * 2}/hour',
+            }
+        # one hash for everyone, the password is still checked on every sign in.
+        encoded = make_password(password)
+        User.all_objects.bulk_create(
+            User(username=f'{prefix}{i}', email=f'{prefix}{i}@example.com', password=encoded)
+            for i in range(max(threads))
+        )
+        usernames = [f'{prefix}{i}' for i in range(max(threads))]
+        try:
+            view, factory = self.get_view(), APIRequestFactory()
+            # the first sign in creates the token.
+            self.sign_in(view, factory, usernames[0], password)
+            with CaptureQueriesContext(connection) as queries:
+                self.sign_in(view, factory, usernames[0], password)
+            self.stdout.write(
+                f"{len(queries)} queries per sign in, {count} sign-ins per run "
+                f"on {os.cpu_count()} cpus:"
+            )
+            self.stdout.write(f"{'threads':<10}{'sign-ins/s':>12}{'ms/sign-in':>12}")
+            for n in threads:
+                rate = self.measure(usernames, password, n, count)
+                self.stdout.write(f"{n:<10}{rate:>12.1f}{n * 1000 / rate:>12.1f}")
+        finally:
+            # buffered history rows must land before their users are gone.
+            flush_batch_writers()
+            if not options['keep']:
+                created = User.all_objects.filter(username__startswith=prefix)
+                for batch in chunked(created.values_list('id', flat=True), 5000):
+                    User.all_objects.filter(id__in=batch).delete()
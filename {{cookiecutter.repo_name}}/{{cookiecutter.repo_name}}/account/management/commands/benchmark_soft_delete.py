@@ -0,0 +1,86 @@
+import re
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models.functions import Lower
+
+from ...lookups import filter_by_email
+from ...models import User
+from ....core.utils import chunked
+
+
+class Command(BaseCommand):
+    help = "Time user listings and lookups on a table where most rows are soft deleted."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100000, help="Users to create.")
+        parser.add_argument('--deleted', type=float, default=0.9, help="Share to delete.")
+        parser.add_argument('--repeat', type=int, default=200, help="Runs per query.")
+        parser.add_argument('--keep', action='store_true', help="Keep the created users.")
+
+    def seed(self, prefix, count, deleted):
+        every = max(1, round(1 / (1 - deleted))) if deleted < 1 else count + 1
+        users = (
+            User(
+                username=f'{prefix}{i}',
+                email=f'{prefix}{i}@example.com',
+                phone=f'+1{i:010d}',
+                password='!',
+                # one live user per `every` rows, spread over the whole table.
+                is_deleted=i % every != 0,
+                is_active=i % every == 0,
+            )
+            for i in range(count)
+        )
+        for batch in chunked(users, 5000):
+            User.all_objects.bulk_create(batch)
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {User._meta.db_table}')
+        return every
+
+    def measure(self, name, queryset, repeat):
+        match = re.search(r'using (\w+)', queryset.explain())
+        list(queryset.all())
+        start = time.perf_counter()
+        for _ in range(repeat):
+            # .all() clones, the result cache of `queryset` stays empty.
+            list(queryset.all())
+        elapsed = (time.perf_counter() - start) / repeat * 1000
+        index = match.group(1) if match else 'seq scan'
+        self.stdout.write(f"{name:<28}{elapsed:>10.3f} ms   {index}")
+
+    def handle(self, *args, **options):
+        prefix = f'bench{uuid.uuid4().hex[:6]}u'
+        count, repeat = options['users'], options['repeat']
+        start = time.perf_counter()
+        every = self.seed(prefix, count, options['deleted'])
+        elapsed, live_count = time.perf_counter() - start, count // every
+        self.stdout.write(f"created {count} users, {live_count} live, in {elapsed:.1f}s")
+        try:
+            live = every * (count // every // 2)
+            username, email = f'{prefix}{live}', f'{prefix}{live}@example.com'
+            live_users = User.objects.order_by('id')
+            all_users = User.all_objects.order_by('id')
+            middle = all_users.values_list('id', flat=True).get(username=username)
+            queries = (
+                ("live list, first page", live_users[:20]),
+                ("live list, keyset page", live_users.filter(id__gt=middle)[:20]),
+                ("all users list, first page", all_users[:20]),
+                ("live email lookup", filter_by_email(live_users, email.upper())),
+                ("live phone lookup", live_users.filter(phone=f'+1{live:010d}')),
+                ("live username lookup", live_users.filter(username=username)),
+                (
+                    "all users email lookup",
+                    all_users.alias(email_lower=Lower('email')).filter(email_lower=email)
+                ),
+            )
+            self.stdout.write(f"{'query':<28}{'per run':>13}   index")
+            for name, queryset in queries:
+                self.measure(name, queryset, repeat)
+        finally:
+            if not options['keep']:
+                seeded = User.all_objects.filter(username__startswith=prefix)
+                for batch in chunked(seeded.values_list('id', flat=True), 5000):
+                    User.all_objects.filter(id__in=batch).delete()
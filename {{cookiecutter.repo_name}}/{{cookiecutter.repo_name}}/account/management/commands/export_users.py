@@ -0,0 +1,45 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from ...transfer import CSV, EXPORT_FIELDS, JSONL, export_users, get_format, write_rows
+
+
+class Command(BaseCommand):
+    help = "Stream every user to a csv or jsonl file in constant memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to write, - writes stdout.")
+        parser.add_argument(
+            '--format',
+            choices=[CSV, JSONL],
+            help="Defaults to the file extension, else csv."
+        )
+        parser.add_argument('--exclude-deleted', action='store_true')
+        parser.add_argument(
+            '--with-password',
+            action='store_true',
+            help="Include the password hashes, import_users keeps them as they are."
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help="Rows fetched per round trip."
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fields = EXPORT_FIELDS
+        if options['with_password']:
+            fields += ('password',)
+        rows = export_users(fields, options['chunk_size'], options['exclude_deleted'])
+        if path == '-':
+            stream = sys.stdout
+        else:
+            stream = open(path, 'w', newline='', encoding='utf-8')
+        try:
+            write_rows(stream, rows, fields, get_format(path, options['format']))
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from ...partitions import (
+    add_months,
+    archive_partition,
+    create_partition,
+    detach_partition,
+    existing_partitions,
+    expired_partitions,
+    partition_name,
+)
+
+
+class Command(BaseCommand):
+    help = "Create upcoming monthly UnitOfHistory partitions and detach or archive expired ones."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ahead',
+            type=int,
+            default=settings.HISTORY_PARTITIONS_AHEAD,
+            help="Number of future months to create partitions for."
+        )
+        parser.add_argument(
+            '--retention',
+            type=int,
+            default=settings.HISTORY_RETENTION_MONTHS,
+            help="Months of history to keep attached, 0 keeps everything."
+        )
+        parser.add_argument(
+            '--archive-dir',
+            default=settings.HISTORY_ARCHIVE_DIR,
+            help="Dump expired partitions to gzipped csv files here and drop them. "
+                 "Without it expired partitions are only detached."
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("History partitioning requires PostgreSQL.")
+        current = timezone.now().date().replace(day=1)
+        existing = existing_partitions()
+        for offset in range(options['ahead'] + 1):
+            month = add_months(current, offset)
+            if partition_name(month) not in existing:
+                self.stdout.write(f"Created {create_partition(month)}")
+        if not options['retention']:
+            return
+        for name in expired_partitions(add_months(current, -options['retention'])):
+            if name in existing:
+                detach_partition(name)
+                self.stdout.write(f"Detached {name}")
+            # partitions detached by an earlier run are archived as well.
+            if options['archive_dir']:
+                path = archive_partition(name, options['archive_dir'])
+                self.stdout.write(f"Archived {name} to {path}")
@@ -0,0 +1,51 @@
+import os
+import sys
+
+from django.core.management.base import BaseCommand
+
+from ...hashers import PasswordHashingService
+from ...transfer import CSV, JSONL, get_format, import_users, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Create users from a csv or jsonl file "
+        "(username, email, phone, name, gender, password)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to read, - reads stdin.")
+        parser.add_argument(
+            '--format',
+            choices=[CSV, JSONL],
+            help="Defaults to the file extension, else csv."
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help="Password hashing processes, the cpu count by default. 0 hashes inline."
+        )
+
+    def report(self, line, errors):
+        self.stderr.write(f"row {line}: {'; '.join(errors)}")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = get_format(path, options['format'])
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        workers = os.cpu_count() if options['workers'] is None else options['workers']
+        hashing = PasswordHashingService(workers=workers)
+        try:
+            created = import_users(
+                read_rows(stream, file_format),
+                batch_size=options['batch_size'],
+                hashing=hashing,
+                on_error=self.report
+            )
+        finally:
+            hashing.shutdown()
+            if stream is not sys.stdin:
+                stream.close()
+        self.stdout.write(self.style.SUCCESS(f"Created {created} users."))
@@ -1,8 +1,39 @@
 # at matrimony/backend/user/managers.py
+import datetime
+import hashlib
+import hmac
+import threading
+
+from django.conf import settings
 from django.contrib.auth.models import BaseUserManager
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+from django.db.models import F
+from django.utils import timezone
+
+from .hashers import set_password
+from ..core.utils import create_otp
 
 
 class UserManager(BaseUserManager):
+    """
+    User.objects only returns users which aren't soft deleted, User.all_objects
+    (the default manager, also used by the admin and unique validation)
+    returns every row.
+    """
+
+    def __init__(self, include_deleted=False):
+        super().__init__()
+        self.include_deleted = include_deleted
+        # its partial index holds exactly the live users, see estimated_count.
+        self.estimate_relation = None if include_deleted else 'account_user_live_idx'
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.include_deleted:
+            return queryset
+        return queryset.filter(is_deleted=False)
+
     def create_user(
         self,
         username,
@@ -22,7 +53,7 @@ class UserManager(BaseUserManager):
             is_superuser=is_superuser,
             **extra_fields
         )
-        user.set_password(password)
+        set_password(user, password)
         user.save(using=self.db)
         return user
 
@@ -50,3 +81,97 @@ class UserDeviceTokenManager(BaseUserManager):
                 device_token=device_token
             )
 
+
+class UnitOfHistoryQuerySet(models.QuerySet):
+    """
+    The history table is partitioned by month on `created`. Filtering
+    with plain range conditions on it lets postgres skip the other
+    partitions, wrapping the column in a function (e.g. __date) does not.
+    """
+
+    def between(self, start, end):
+        return self.filter(created__gte=start, created__lt=end)
+
+    def in_month(self, year, month):
+        start = timezone.make_aware(datetime.datetime(year, month, 1))
+        end = timezone.make_aware(datetime.datetime(year + month // 12, month % 12 + 1, 1))
+        return self.between(start, end)
+
+    def for_object(self, obj):
+        return self.filter(
+            content_type=ContentType.objects.get_for_model(obj),
+            object_id=str(obj.pk)
+        )
+
+
+class UserAgentManager(models.Manager):
+    # digest -> id of the user agents this process already knows, shared by
+    # the threads of the history writer.
+    known_ids = {}
+    known_ids_lock = threading.Lock()
+
+    def intern(self, values) -> dict:
+        """
+        Map user agent strings to UserAgent ids, inserting the unknown ones
+        with a single bulk insert.
+        """
+        digests = {value: hashlib.sha1(value.encode()).hexdigest() for value in set(values)}
+        with self.known_ids_lock:
+            ids = {
+                digest: self.known_ids[digest]
+                for digest in digests.values() if digest in self.known_ids
+            }
+        missing = {digest: value for value, digest in digests.items() if digest not in ids}
+        if missing:
+            self.bulk_create(
+                [self.model(digest=digest, value=value) for digest, value in missing.items()],
+                ignore_conflicts=True
+            )
+            fetched = dict(self.filter(digest__in=missing).values_list('digest', 'id'))
+            ids.update(fetched)
+            with self.known_ids_lock:
+                if len(self.known_ids) > 10000:
+                    self.known_ids.clear()
+                self.known_ids.update(fetched)
+        return {value: ids[digest] for value, digest in digests.items()}
+
+
+class PhoneOTPManager(models.Manager):
+
+    @staticmethod
+    def hash_code(phone, code):
+        # a keyed hash, 6 digit codes are trivial to brute force otherwise.
+        return hmac.new(
+            settings.SECRET_KEY.encode(), f'{phone}:{code}'.encode(), hashlib.sha256
+        ).hexdigest()
+
+    def issue(self, phone) -> str:
+        """Replace the pending otp of `phone`, returns the new code."""
+        code = create_otp()
+        self.update_or_create(
+            phone=phone,
+            defaults={
+                'code_hash': self.hash_code(phone, code),
+                'attempts': 0,
+                'expires': timezone.now() + datetime.timedelta(minutes=settings.OTP_TIME_OUT),
+            }
+        )
+        return code
+
+    def verify(self, phone, code) -> bool:
+        """
+        Compare and delete in one statement, a code can only be used once
+        and only before it expires or runs out of attempts.
+        """
+        deleted, _ = self.filter(
+            phone=phone,
+            code_hash=self.hash_code(phone, code),
+            expires__gt=timezone.now(),
+            attempts__lt=settings.OTP_MAX_ATTEMPTS
+        ).delete()
+        if not deleted:
+            self.filter(phone=phone).update(attempts=F('attempts') + 1)
+        return bool(deleted)
+
+    def purge_expired(self):
+        return self.filter(expires__lte=timezone.now()).delete()
@@ -0,0 +1,18 @@
+# at ./backend/account/middleware.py
+from .activity import get_activity_tracker
+
+
+class ActivityMiddleware:
+    """Keep User.last_active_on current, see account.activity."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        # checked after the view, DRF sets request.user once it authenticated
+        # the token.
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            get_activity_tracker().touch(user)
+        return response
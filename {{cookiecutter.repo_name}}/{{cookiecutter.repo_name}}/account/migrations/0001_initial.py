@@ -0,0 +1,87 @@
+# Generated by Django 4.0.1 on 2026-10-18 17:29
+
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import {{cookiecutter.repo_name}}.core.validators
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='User',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('password', models.CharField(max_length=128, verbose_name='password')),
+                ('last_login', models.DateTimeField(blank=True, null=True, verbose_name='last login')),
+                ('username', models.CharField(error_messages={'unique': 'A user with that username already exists.'}, help_text='Required. 150 characters or fewer. Letters, digits and @/./+/-/_ only.', max_length=150, unique=True, validators=[{{cookiecutter.repo_name}}.core.validators.username_validator], verbose_name='username')),
+                ('name', models.CharField(blank=True, max_length=150, null=True)),
+                ('email', models.EmailField(max_length=100, unique=True)),
+                ('phone', models.CharField(blank=True, max_length=15, null=True, unique=True, validators=[django.core.validators.RegexValidator(message='Enter Phone number with country code', regex='^\\+?1?\\d{9,15}$')], verbose_name='phone number')),
+                ('gender', models.CharField(blank=True, choices=[('female', 'Female'), ('male', 'Male')], max_length=8, null=True)),
+                ('date_of_birth', models.DateField(blank=True, null=True)),
+                ('photo', models.ImageField(blank=True, null=True, upload_to='profile_pictures/', verbose_name='ProfilePicture')),
+                ('activation_token', models.UUIDField(blank=True, null=True)),
+                ('activation_token_created', models.DateTimeField(blank=True, null=True)),
+                ('otp', models.CharField(max_length=6)),
+                ('otp_created', models.DateTimeField(blank=True, null=True)),
+                ('is_email_verified', models.BooleanField(default=False)),
+                ('is_phone_verified', models.BooleanField(default=False)),
+                ('term_and_condition_accepted', models.BooleanField(default=False)),
+                ('privacy_policy_accepted', models.BooleanField(default=False)),
+                ('is_active', models.BooleanField(default=True)),
+                ('is_staff', models.BooleanField(default=False)),
+                ('is_superuser', models.BooleanField(default=False)),
+                ('is_deleted', models.BooleanField(default=False)),
+                ('deleted_on', models.DateTimeField(blank=True, null=True)),
+                ('deleted_phone', models.CharField(blank=True, max_length=15, null=True, unique=True)),
+                ('last_active_on', models.DateTimeField(blank=True, null=True)),
+                ('date_joined', models.DateTimeField(default=django.utils.timezone.now, verbose_name='date joined')),
+                ('deactivation_reason', models.TextField(blank=True, null=True)),
+                ('groups', models.ManyToManyField(blank=True, help_text='The groups this user belongs to. A user will get all permissions granted to each of their groups.', related_name='user_set', related_query_name='user', to='auth.Group', verbose_name='groups')),
+                ('user_permissions', models.ManyToManyField(blank=True, help_text='Specific permissions for this user.', related_name='user_set', related_query_name='user', to='auth.Permission', verbose_name='user permissions')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='UserDeviceToken',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('device_token', models.CharField(max_length=200)),
+                ('device_type', models.CharField(choices=[('ios', 'Ios'), ('android', 'Android'), ('web', 'Web')], max_length=8)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='UnitOfHistory',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(blank=True, max_length=255, null=True)),
+                ('created', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('old_meta', models.JSONField(null=True)),
+                ('new_meta', models.JSONField(null=True)),
+                ('header', models.JSONField(null=True)),
+                ('object_id', models.CharField(max_length=100)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+                ('perform_for', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='perform_for', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='performer', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.0.1 on 2026-10-18 17:29
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(django.db.models.functions.text.Lower('email'), name='account_user_email_lower_idx'),
+        ),
+    ]
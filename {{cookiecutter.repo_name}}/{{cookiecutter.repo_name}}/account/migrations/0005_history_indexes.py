@@ -0,0 +1,25 @@
+# Generated by Django 4.0.1 on 2026-10-18 17:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0004_user_date_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='unitofhistory',
+            index=models.Index(fields=['created'], name='account_history_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='unitofhistory',
+            index=models.Index(fields=['action'], name='account_history_action_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='unitofhistory',
+            index=models.Index(fields=['content_type', 'object_id'], name='account_history_object_idx'),
+        ),
+    ]
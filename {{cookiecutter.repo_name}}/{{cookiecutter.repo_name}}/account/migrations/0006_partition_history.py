@@ -0,0 +1,84 @@
+from django.db import migrations
+
+# Rebuild account_unitofhistory as a table range partitioned by month on
+# `created`. Postgres can't turn an existing table into a partitioned one,
+# so the table is renamed, recreated, filled and its indexes and foreign
+# keys are recreated from the old definitions. The primary key has to
+# include the partition key, the id sequence keeps serving `id`.
+REBUILD_SQL = """
+DO $$
+DECLARE
+    index_definitions text[];
+    constraint_definitions text[];
+    definition text;
+    sequence_name text;
+    month date;
+BEGIN
+    SELECT coalesce(array_agg(indexdef), '{}') INTO index_definitions
+      FROM pg_indexes
+     WHERE schemaname = current_schema()
+       AND tablename = 'account_unitofhistory'
+       AND indexname <> 'account_unitofhistory_pkey';
+    SELECT coalesce(array_agg(format('ALTER TABLE account_unitofhistory ADD CONSTRAINT %%I %%s',
+                                     conname, pg_get_constraintdef(oid))), '{}')
+      INTO constraint_definitions
+      FROM pg_constraint
+     WHERE conrelid = 'account_unitofhistory'::regclass AND contype = 'f';
+    sequence_name := pg_get_serial_sequence('account_unitofhistory', 'id');
+
+    ALTER TABLE account_unitofhistory RENAME TO account_unitofhistory_old;
+    EXECUTE format('ALTER TABLE account_unitofhistory_old DROP CONSTRAINT %%I',
+                   'account_unitofhistory_pkey');
+    CREATE TABLE account_unitofhistory (
+        LIKE account_unitofhistory_old INCLUDING DEFAULTS INCLUDING CONSTRAINTS,
+        %(primary_key)s
+    ) %(partition_by)s;
+    EXECUTE format('ALTER SEQUENCE %%s OWNED BY account_unitofhistory.id', sequence_name);
+
+    IF %(partitioned)s THEN
+        SELECT date_trunc('month', coalesce(min(created), now()))::date INTO month
+          FROM account_unitofhistory_old;
+        WHILE month <= date_trunc('month', now() + interval '3 months') LOOP
+            EXECUTE format('CREATE TABLE %%I PARTITION OF account_unitofhistory FOR VALUES FROM (%%L) TO (%%L)',
+                           'account_unitofhistory_p' || to_char(month, 'YYYY_MM'),
+                           month, month + interval '1 month');
+            month := month + interval '1 month';
+        END LOOP;
+        CREATE TABLE account_unitofhistory_default PARTITION OF account_unitofhistory DEFAULT;
+    END IF;
+
+    INSERT INTO account_unitofhistory SELECT * FROM account_unitofhistory_old;
+    DROP TABLE account_unitofhistory_old;
+    FOREACH definition IN ARRAY index_definitions LOOP
+        EXECUTE definition;
+    END LOOP;
+    FOREACH definition IN ARRAY constraint_definitions LOOP
+        EXECUTE definition;
+    END LOOP;
+END $$;
+"""
+
+
+def rebuild(partitioned):
+    sql = REBUILD_SQL % {
+        'primary_key': 'PRIMARY KEY (id, created)' if partitioned else 'PRIMARY KEY (id)',
+        'partition_by': 'PARTITION BY RANGE (created)' if partitioned else '',
+        'partitioned': 'true' if partitioned else 'false',
+    }
+
+    def run(apps, schema_editor):
+        # partitioning is postgres only, other databases keep a plain table.
+        if schema_editor.connection.vendor == 'postgresql':
+            schema_editor.execute(sql, params=None)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0005_history_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild(partitioned=True), rebuild(partitioned=False)),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.0.1 on 2026-10-18 17:53
+
+import django.core.validators
+from django.db import migrations, models
+
+
+def restore_deleted_phones(apps, schema_editor):
+    # deleted users keep their phone now, instead of moving it to deleted_phone.
+    User = apps.get_model('account', 'User')
+    User.objects.filter(is_deleted=True, deleted_phone__isnull=False).update(phone=models.F('deleted_phone'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0009_phone_otp'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='email',
+            field=models.EmailField(max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='phone',
+            field=models.CharField(blank=True, max_length=15, null=True, validators=[django.core.validators.RegexValidator(message='Enter Phone number with country code', regex='^\\+?1?\\d{9,15}$')], verbose_name='phone number'),
+        ),
+        migrations.AddConstraint(
+            model_name='user',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_deleted', False)), fields=('email',), name='account_user_email_live_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='user',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_deleted', False)), fields=('phone',), name='account_user_phone_live_uniq'),
+        ),
+        migrations.RunPython(restore_deleted_phones, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='user',
+            name='deleted_phone',
+        ),
+    ]
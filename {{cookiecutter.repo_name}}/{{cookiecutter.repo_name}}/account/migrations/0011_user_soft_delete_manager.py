@@ -0,0 +1,37 @@
+# Generated by Django 4.0.1 on 2026-10-18 17:55
+
+from django.db import migrations, models
+import django.db.models.functions.text
+import django.db.models.manager
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0010_user_live_unique'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='user',
+            options={'default_manager_name': 'all_objects'},
+        ),
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='user',
+            name='account_user_email_lower_idx',
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(django.db.models.functions.text.Lower('email'), condition=models.Q(('is_deleted', False)), name='account_user_email_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['id'], name='account_user_live_idx'),
+        ),
+    ]
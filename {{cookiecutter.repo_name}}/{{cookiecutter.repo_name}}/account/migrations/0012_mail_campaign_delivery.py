@@ -0,0 +1,27 @@
+# Generated by Django 4.0.1 on 2026-10-18 18:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0011_user_soft_delete_manager'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MailCampaignDelivery',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipient_id', models.BigIntegerField()),
+                ('sent', models.BooleanField()),
+                ('campaign', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='account.mailcampaign')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='mailcampaigndelivery',
+            constraint=models.UniqueConstraint(fields=('campaign', 'recipient_id'), name='account_campaigndelivery_unique'),
+        ),
+    ]
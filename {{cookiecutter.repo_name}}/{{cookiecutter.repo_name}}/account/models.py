@@ -1,22 +1,35 @@
 # at ./backend/user/models.py
+from datetime import timedelta
+
 from django.conf import settings
+from django.contrib.auth.hashers import check_password
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.indexes import GinIndex
 from django.core.validators import RegexValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Lower
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
-from .tasks import send_otp_on_delay, send_email_on_delay
-from .choices import GenderChoices, DeviceTypeChoices
-from .managers import UserManager, UserDeviceTokenManager
-from ..core.utils import create_token, build_absolute_uri, create_otp
+from .tasks import send_otp_on_delay, send_email_on_delay, send_campaign_on_delay
+from .choices import GenderChoices, DeviceTypeChoices, CampaignStatusChoices
+from .hashers import set_password
+from .history import extract_headers, get_history_writer
+from .managers import (
+    UserManager,
+    UserDeviceTokenManager,
+    UnitOfHistoryQuerySet,
+    UserAgentManager,
+    PhoneOTPManager,
+)
+from ..core.utils import create_token, build_absolute_uri
 from ..core.validators import username_validator
-from ..core.models import BaseModel
+from ..core.models import BaseModel, DirtyFieldsMixin
 
 
-class User(AbstractBaseUser, PermissionsMixin):
+class User(DirtyFieldsMixin, AbstractBaseUser, PermissionsMixin):
     """{{cookiecutter.repo_name}} user information.
     all fields are common for all users."""
     username = models.CharField(
@@ -35,9 +48,8 @@ class User(AbstractBaseUser, PermissionsMixin):
         null=True
     )
     email = models.EmailField(
-        max_length=100,
-        unique=True
-    )  # unique email to perform email login and send alert mail.
+        max_length=100
+    )  # unique among live users (see Meta) to perform email login and send alert mail.
     phone_regex = RegexValidator(
         regex=r"^\+?1?\d{9,15}$",
         message="Enter Phone number with country code"
@@ -46,10 +58,9 @@ class User(AbstractBaseUser, PermissionsMixin):
         _("phone number"),
         validators=[phone_regex],
         max_length=15,
-        unique=True,
         blank=True,
         null=True
-    )
+    )  # unique among live users, see Meta.
     gender = models.CharField(
         max_length=8,
         choices=GenderChoices.choices,
@@ -76,13 +87,6 @@ class User(AbstractBaseUser, PermissionsMixin):
         blank=True,
         null=True
     )
-    otp = models.CharField(
-        max_length=6
-    )
-    otp_created = models.DateTimeField(
-        blank=True,
-        null=True
-    )
     is_email_verified = models.BooleanField(
         default=False
     )
@@ -112,12 +116,6 @@ class User(AbstractBaseUser, PermissionsMixin):
         null=True,
         blank=True
     )
-    deleted_phone = models.CharField(
-        max_length=15,
-        unique=True,
-        blank=True,
-        null=True
-    )
 
     # details
     last_active_on = models.DateTimeField(
@@ -136,6 +134,66 @@ class User(AbstractBaseUser, PermissionsMixin):
     # password also provide by django abstract_base_user.
     USERNAME_FIELD = 'username'
     objects = UserManager()
+    all_objects = UserManager(include_deleted=True)
+    # secrets are never copied into the audit history.
+    diff_exclude = ('password', 'activation_token')
+
+    class Meta:
+        # usernames stay taken after deletion, their unique validation has
+        # to see deleted users too.
+        default_manager_name = 'all_objects'
+        constraints = [
+            # deleted users keep their email and phone, which can be used
+            # again by a new account.
+            models.UniqueConstraint(
+                fields=['email'],
+                condition=models.Q(is_deleted=False),
+                name='account_user_email_live_uniq'
+            ),
+            models.UniqueConstraint(
+                fields=['phone'],
+                condition=models.Q(is_deleted=False),
+                name='account_user_phone_live_uniq'
+            ),
+        ]
+        indexes = [
+            # serves case insensitive email lookups, see account.lookups.
+            models.Index(
+                Lower('email'),
+                condition=models.Q(is_deleted=False),
+                name='account_user_email_lower_idx'
+            ),
+            # User.objects listings in id (keyset) order skip deleted rows.
+            models.Index(
+                fields=['id'],
+                condition=models.Q(is_deleted=False),
+                name='account_user_live_idx'
+            ),
+            # trigram indexes for the ranked user search, see UserFilter.
+            GinIndex(
+                fields=['username'],
+                name='account_user_username_trgm',
+                opclasses=['gin_trgm_ops']
+            ),
+            GinIndex(
+                fields=['name'],
+                name='account_user_name_trgm',
+                opclasses=['gin_trgm_ops']
+            ),
+            GinIndex(
+                fields=['email'],
+                name='account_user_email_trgm',
+                opclasses=['gin_trgm_ops']
+            ),
+            GinIndex(
+                fields=['phone'],
+                name='account_user_phone_trgm',
+                opclasses=['gin_trgm_ops']
+            ),
+            # admin date hierarchy/filters and ordering.
+            models.Index(fields=['date_joined'], name='account_user_joined_idx'),
+            models.Index(fields=['last_active_on'], name='account_user_active_idx'),
+        ]
 
     def __str__(self) -> str:
         return self.username
@@ -144,11 +202,23 @@ class User(AbstractBaseUser, PermissionsMixin):
     def is_admin(self):
         return self.is_staff or self.is_superuser
 
-    def send_email_verification(self):
+    def check_password(self, raw_password):
+        """Hashes made with an outdated hasher or cost are upgraded through the hashing service."""
+        def setter(raw_password):
+            set_password(self, raw_password)
+            self._password = None
+            self.save(update_fields=['password'])
+        return check_password(raw_password, self.password, setter)
+
+    def prepare_email_verification(self) -> list:
+        """Set a new activation token, returns the changed fields."""
         self.activation_token = create_token()
         self.is_email_verified = False
         self.activation_token_created = timezone.now()
-        self.save()
+        return ['activation_token', 'is_email_verified', 'activation_token_created']
+
+    def queue_email_verification(self):
+        """Mail the activation link once the current transaction commits."""
         context = {
             'full_name': self.name,
             'email': self.email,
@@ -156,14 +226,53 @@ class User(AbstractBaseUser, PermissionsMixin):
         }
         template = 'emails/sing_up_email.html'
         subject = 'Email Verification'
-        # send_email_on_delay.delay(template, context, subject, self.email)
+        email = self.email
+        transaction.on_commit(lambda: send_email_on_delay.delay(template, context, subject, email))
+
+    def send_email_verification(self):
+        self.save(update_fields=self.prepare_email_verification())
+        self.queue_email_verification()
 
     def send_otp(self):
-        self.otp = create_otp()
-        self.is_phone_verified = False
-        self.otp_created = timezone.now()
-        self.save()
-        # send_otp_on_delay.delay(self.phone, self.otp)
+        """Issue a new otp for the phone, the sms is sent once the current
+        transaction commits. The user row itself isn't written."""
+        phone = self.phone
+        otp = PhoneOTP.objects.issue(phone)
+        transaction.on_commit(lambda: send_otp_on_delay.delay(phone, otp))
+
+
+class PhoneOTP(models.Model):
+    """One pending otp per phone number, kept out of the users table.
+    Only an HMAC of the code is stored, see PhoneOTPManager."""
+    phone = models.CharField(
+        max_length=15,
+        unique=True
+    )
+    code_hash = models.CharField(
+        max_length=64
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0
+    )  # failed verifications, the code is void after OTP_MAX_ATTEMPTS.
+    expires = models.DateTimeField()
+    objects = PhoneOTPManager()
+
+    def __str__(self) -> str:
+        return self.phone
+
+
+class UserAgent(models.Model):
+    """User agent strings are repeated on nearly every history row,
+    each distinct string is stored once and referenced by id."""
+    digest = models.CharField(
+        max_length=40,
+        unique=True
+    )  # sha1 of value.
+    value = models.TextField()
+    objects = UserAgentManager()
+
+    def __str__(self) -> str:
+        return self.value
 
 
 class UnitOfHistory(models.Model):
@@ -176,8 +285,9 @@ class UnitOfHistory(models.Model):
         null=True
     )  # in this field we will define which action was perform.
     created = models.DateTimeField(
-        auto_now_add=True
-    )
+        default=timezone.now,
+        editable=False
+    )  # set when the action happened, not when the buffered row is written.
     old_meta = models.JSONField(
         null=True
     )  # we store data what was the scenario before perform this action.
@@ -186,8 +296,15 @@ class UnitOfHistory(models.Model):
     )  # we store data after perform this action.
     header = models.JSONField(
         null=True
-    )  # request header that will provide user browser
-    # information and others details.
+    )  # allow-listed request headers (settings.HISTORY_HEADERS) that will
+    # provide user browser information and others details.
+    user_agent = models.ForeignKey(
+        UserAgent,
+        on_delete=models.SET_NULL,
+        null=True,
+        db_index=False,
+        related_name='+'
+    )  # user agents are never deleted, no index needed.
     user = models.ForeignKey(
         User,
         on_delete=models.SET_NULL,
@@ -210,6 +327,16 @@ class UnitOfHistory(models.Model):
         max_length=100
     )
     content_object = GenericForeignKey()
+    objects = UnitOfHistoryQuerySet.as_manager()
+
+    class Meta:
+        # the table itself is range partitioned by month on `created`,
+        # see migration 0006 and the history_partitions command.
+        indexes = [
+            models.Index(fields=['created'], name='account_history_created_idx'),
+            models.Index(fields=['action'], name='account_history_action_idx'),
+            models.Index(fields=['content_type', 'object_id'], name='account_history_object_idx'),
+        ]
 
     def __str__(self) -> str:
         return self.action or "action"
@@ -224,20 +351,19 @@ class UnitOfHistory(models.Model):
         old_meta=None,
         perform_for=None
     ) -> object:
-        try:
-            data = {i[0]: i[1] for i in request.META.items() if i[0].startswith('HTTP_')}
-        except BaseException:
-            data = None
-        cls.objects.create(
-            action=action,
-            user=user,
-            old_meta=old_meta,
-            new_meta=new_meta,
-            header=data,
-            perform_for=perform_for,
-            content_type=ContentType.objects.get_for_model(User),
-            object_id=user.id
-        )
+        meta = getattr(request, 'META', {})
+        return get_history_writer().write({
+            'action': action,
+            'user_id': user.id,
+            'old_meta': old_meta,
+            'new_meta': new_meta,
+            'header': extract_headers(meta),
+            'user_agent': meta.get('HTTP_USER_AGENT'),
+            'perform_for_id': perform_for.id if perform_for else None,
+            'content_type_id': ContentType.objects.get_for_model(User).id,
+            'object_id': user.id,
+            'created': timezone.now(),
+        })
 
 
 class UserDeviceToken(BaseModel):
@@ -260,4 +386,128 @@ class UserDeviceToken(BaseModel):
     objects = UserDeviceTokenManager()
 
     def __str__(self):
-        return self.user
+        return str(self.user)
+
+
+class MailCampaign(BaseModel):
+    """
+    Personalized mail to many users. Recipients are sent in id order by
+    celery workers in chunks, every handled recipient is recorded so a
+    resumed campaign or a redelivered chunk sends each mail once.
+    """
+    subject = models.CharField(
+        max_length=255
+    )
+    template = models.CharField(
+        max_length=255
+    )  # e.g. "mail/newsletter.html", a .txt sibling is used as text part.
+    context = models.JSONField(
+        default=dict,
+        blank=True
+    )  # shared by every recipient, the user fields are added per recipient.
+    recipient_filter = models.JSONField(
+        default=dict,
+        blank=True
+    )  # User.objects.filter(**recipient_filter), e.g. {"is_email_verified": true}
+    status = models.CharField(
+        max_length=16,
+        choices=CampaignStatusChoices.choices,
+        default=CampaignStatusChoices.PENDING
+    )
+    last_user_id = models.BigIntegerField(
+        default=0
+    )  # last recipient handed to a worker.
+    recipient_count = models.PositiveIntegerField(
+        default=0
+    )  # recipients handed to workers so far.
+    sent_count = models.PositiveIntegerField(
+        default=0
+    )
+    failed_count = models.PositiveIntegerField(
+        default=0
+    )
+
+    def __str__(self) -> str:
+        return self.subject
+
+    def get_recipients(self):
+        return User.objects.filter(
+            is_active=True,
+            email__isnull=False,
+            **self.recipient_filter
+        ).exclude(email='')
+
+    def start(self) -> bool:
+        """
+        Queue a pending campaign, or resume one without progress for
+        MAIL_CAMPAIGN_STALE_AFTER seconds. The status is taken with a
+        conditional UPDATE, returns False when the campaign is running or
+        completed already.
+
+        A resumed campaign is dispatched from its first recipient again,
+        chunks skip the recipients recorded in `deliveries`.
+        """
+        now = timezone.now()
+        started = MailCampaign.objects.filter(
+            models.Q(status=CampaignStatusChoices.PENDING) | models.Q(
+                status__in=[CampaignStatusChoices.SENDING, CampaignStatusChoices.DISPATCHED],
+                updated__lt=now - timedelta(seconds=settings.MAIL_CAMPAIGN_STALE_AFTER)
+            ),
+            id=self.id
+        ).update(
+            status=CampaignStatusChoices.SENDING,
+            last_user_id=0,
+            recipient_count=0,
+            updated=now
+        )
+        if not started:
+            return False
+        campaign_id = self.id
+        transaction.on_commit(lambda: send_campaign_on_delay.delay(campaign_id))
+        return True
+
+
+class MailCampaignDelivery(models.Model):
+    """A recipient handled by a campaign chunk, whether the mail was sent or not."""
+    campaign = models.ForeignKey(
+        MailCampaign,
+        on_delete=models.CASCADE,
+        related_name='deliveries'
+    )
+    # a plain id, users removed in the meantime are recorded too.
+    recipient_id = models.BigIntegerField()
+    sent = models.BooleanField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['campaign', 'recipient_id'], name='account_campaigndelivery_unique'
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.campaign_id}: {self.recipient_id}'
+
+
+class MailCampaignFailure(models.Model):
+    campaign = models.ForeignKey(
+        MailCampaign,
+        on_delete=models.CASCADE,
+        related_name='failures'
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+'
+    )
+    email = models.EmailField()
+    error = models.TextField(
+        blank=True
+    )
+    created = models.DateTimeField(
+        auto_now_add=True
+    )
+
+    def __str__(self) -> str:
+        return self.email
@@ -0,0 +1,193 @@
+# at ./backend/account/moderation.py
+import logging
+import uuid
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .authentication import invalidate_token_cache
+from .filters import UserFilter
+from .history import write_history
+from .models import User
+from ..core.cache import FallbackCache
+from ..core.constants import HistoryActions
+from ..core.models import to_json
+
+logger = logging.getLogger(__name__)
+
+DELETE = 'delete'
+DEACTIVATE = 'deactivate'
+HISTORY_ACTIONS = {
+    DELETE: HistoryActions.USER_DELETED,
+    DEACTIVATE: HistoryActions.USER_BLOCKED,
+}
+
+job_cache = FallbackCache(max_size=1000)
+
+
+def get_changes(operation) -> dict:
+    if operation == DELETE:
+        return {
+            'is_deleted': True,
+            'deleted_on': timezone.now(),
+            'is_active': False,
+        }
+    # without a deactivation_reason the user can't reactivate by signing in.
+    return {
+        'is_active': False,
+        'deactivation_reason': None,
+    }
+
+
+def get_pending(operation, queryset):
+    """The users of `queryset` which the operation still changes."""
+    if operation == DELETE:
+        # User.objects leaves deleted users out already.
+        return queryset
+    return queryset.filter(Q(is_active=True) | Q(deactivation_reason__isnull=False))
+
+
+def select_users(ids=None, filters=None):
+    """Users by id or by UserFilter parameters, validated by BulkUserSerializer."""
+    if ids is not None:
+        return User.objects.filter(id__in=ids)
+    return UserFilter(data=filters, queryset=User.objects.all()).qs
+
+
+def apply_chunk(
+    operation, user_ids, performed_by_id, header=None, user_agent=None
+) -> list:
+    """
+    Change one chunk of users with a single UPDATE, in a transaction with
+    the history rows of the changed users. Returns their ids.
+    """
+    changes = get_changes(operation)
+    with transaction.atomic():
+        rows = list(
+            get_pending(operation, User.objects.filter(id__in=user_ids)).exclude(
+                id=performed_by_id
+            ).select_for_update().values_list('id', *changes)
+        )
+        if not rows:
+            return []
+        ids = [row[0] for row in rows]
+        User.objects.filter(id__in=ids).update(**changes)
+        content_type_id = ContentType.objects.get_for_model(User).id
+        new_meta = {field: to_json(value) for field, value in changes.items()}
+        now = timezone.now()
+        # the same entries UnitOfHistory.user_history writes, in one bulk insert.
+        write_history([
+            {
+                'action': HISTORY_ACTIONS[operation],
+                'user_id': performed_by_id,
+                'old_meta': {
+                    field: to_json(value) for field, value in zip(changes, row[1:])
+                },
+                'new_meta': new_meta,
+                'header': header,
+                'user_agent': user_agent,
+                'perform_for_id': row[0],
+                'content_type_id': content_type_id,
+                'object_id': performed_by_id,
+                'created': now,
+            }
+            for row in rows
+        ])
+    invalidate_token_cache(*ids)
+    return ids
+
+
+def run_bulk_operation(
+    operation, performed_by_id, ids=None, filters=None, header=None, user_agent=None,
+    on_progress=None
+) -> int:
+    """
+    Apply `operation` to the selected users in id order, BULK_USER_CHUNK_SIZE
+    users per transaction. The selection is read again for every chunk, a
+    keyset on the id, so it never holds a cursor across the transactions.
+    Calls on_progress(processed, updated) after each chunk and returns the
+    number of changed users.
+    """
+    queryset = select_users(ids, filters).order_by('id')
+    processed = updated = 0
+    last_id = 0
+    while True:
+        chunk = list(
+            queryset.filter(id__gt=last_id).values_list(
+                'id', flat=True
+            )[:settings.BULK_USER_CHUNK_SIZE]
+        )
+        if not chunk:
+            break
+        updated += len(apply_chunk(operation, chunk, performed_by_id, header, user_agent))
+        processed += len(chunk)
+        last_id = chunk[-1]
+        if on_progress:
+            on_progress(processed, updated)
+    return updated
+
+
+def job_key(job_id):
+    return f'bulk-user-job:{job_id}'
+
+
+def get_job(job_id):
+    return job_cache.get(job_key(job_id))
+
+
+def set_job(job_id, **values):
+    job = {**(get_job(job_id) or {}), **values, 'updated_on': timezone.now().isoformat()}
+    job_cache.set(job_key(job_id), job, settings.BULK_USER_JOB_TIMEOUT)
+    return job
+
+
+def start_bulk_job(
+    operation, performed_by_id, ids=None, filters=None, header=None, user_agent=None
+) -> dict:
+    """
+    Queue the operation for a celery worker, its progress is kept under
+    the returned job's id.
+    """
+    from .tasks import run_bulk_job_on_delay
+
+    job_id = uuid.uuid4().hex
+    job = set_job(
+        job_id,
+        id=job_id,
+        operation=operation,
+        status='queued',
+        total=len(ids) if ids is not None else None,
+        processed=0,
+        updated=0
+    )
+    kwargs = {
+        'operation': operation,
+        'performed_by_id': performed_by_id,
+        'ids': ids,
+        'filters': filters,
+        'header': header,
+        'user_agent': user_agent,
+    }
+    transaction.on_commit(lambda: run_bulk_job_on_delay.delay(job_id, kwargs))
+    return job
+
+
+def run_bulk_job(job_id, kwargs):
+    if kwargs['ids'] is None:
+        set_job(job_id, total=select_users(filters=kwargs['filters']).count())
+    set_job(job_id, status='running')
+    try:
+        updated = run_bulk_operation(
+            **kwargs,
+            on_progress=lambda processed, updated: set_job(
+                job_id, processed=processed, updated=updated
+            )
+        )
+    except Exception as e:
+        logger.exception("Bulk user job %s failed.", job_id)
+        set_job(job_id, status='failed', error=str(e))
+        raise
+    set_job(job_id, status='completed', updated=updated)
@@ -0,0 +1,98 @@
+# at ./backend/account/partitions.py
+import datetime
+import gzip
+import os
+
+from django.db import connection, transaction
+
+# UnitOfHistory is range partitioned by month on `created` (migration 0006).
+TABLE = 'account_unitofhistory'
+DEFAULT_PARTITION = f'{TABLE}_default'
+
+
+def add_months(month, count) -> datetime.date:
+    index = month.year * 12 + month.month - 1 + count
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month) -> str:
+    return f'{TABLE}_p{month:%Y_%m}'
+
+
+def existing_partitions() -> set:
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT inhrelid::regclass::text FROM pg_inherits "
+            "WHERE inhparent = %s::regclass",
+            [TABLE]
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+
+@transaction.atomic
+def create_partition(month) -> str:
+    """
+    Create the partition of `month`. Rows of that month which already
+    landed in the default partition are moved into it before attaching.
+    """
+    name = partition_name(month)
+    start, end = month, add_months(month, 1)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+        )
+        cursor.execute(
+            f'WITH moved AS ('
+            f'DELETE FROM {DEFAULT_PARTITION} '
+            f'WHERE created >= %s AND created < %s RETURNING *'
+            f') INSERT INTO {name} SELECT * FROM moved',
+            [start, end]
+        )
+        cursor.execute(
+            f'ALTER TABLE {TABLE} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)',
+            [start, end]
+        )
+    return name
+
+
+def partition_tables() -> set:
+    """Monthly partition tables, attached or detached."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT relname FROM pg_class WHERE relkind = 'r' "
+            "AND relname LIKE %s AND pg_table_is_visible(oid)",
+            [f'{TABLE}_p%']
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+
+def expired_partitions(before) -> list:
+    """
+    Monthly partitions which only hold rows older than `before`. Detached
+    ones are included, they are archived once an archive directory is set.
+    """
+    names = []
+    for name in partition_tables():
+        try:
+            month = datetime.datetime.strptime(name, f'{TABLE}_p%Y_%m').date()
+        except ValueError:
+            continue  # the default partition.
+        if add_months(month, 1) <= before:
+            names.append(name)
+    return sorted(names)
+
+
+def detach_partition(name):
+    with connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {TABLE} DETACH PARTITION {name}')
+
+
+def archive_partition(name, directory) -> str:
+    """Dump a detached partition to a gzipped csv file and drop it."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{name}.csv.gz')
+    with connection.cursor() as cursor:
+        with gzip.open(path, 'wt') as file:
+            cursor.copy_expert(f'COPY {name} TO STDOUT WITH CSV HEADER', file)
+        cursor.execute(f'DROP TABLE {name}')
+    return path
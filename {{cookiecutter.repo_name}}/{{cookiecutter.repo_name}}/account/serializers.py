@@ -1,12 +1,16 @@
-from django.contrib.auth import authenticate, login
+from django.contrib.auth import login
+from django.contrib.auth.signals import user_login_failed
 from django.contrib.auth.password_validation import validate_password
-from django.db.models import Q
-from rest_framework.authtoken.models import Token
+from django.core.validators import EMPTY_VALUES
+from django.db import transaction
 from rest_framework.exceptions import ValidationError
 from rest_framework.serializers import (
     BooleanField,
     CharField,
+    DictField,
     EmailField,
+    IntegerField,
+    ListField,
     ModelSerializer,
     Serializer,
 )
@@ -14,10 +18,15 @@ from rest_framework.serializers import (
 from ..core.constants import HistoryActions
 
 from .models import (
+    PhoneOTP,
     User,
     UnitOfHistory,
     UserDeviceToken,
 )
+from .filters import UserFilter
+from .hashers import set_password
+from .lookups import filter_by_email, get_user_by_identifier
+from .tokens import rotate_token
 
 
 class BioSerializer(ModelSerializer):
@@ -34,7 +43,30 @@ class BioSerializer(ModelSerializer):
         )
 
 
-class UserSerializer(ModelSerializer):
+class LiveUniqueMixin:
+    """
+    email and phone are only unique among users which aren't deleted (a
+    partial constraint), so ModelSerializer doesn't validate them itself.
+    """
+
+    def get_live_users(self):
+        queryset = User.objects.all()
+        if self.instance is not None:
+            queryset = queryset.exclude(pk=self.instance.pk)
+        return queryset
+
+    def validate_email(self, value):
+        if value and filter_by_email(self.get_live_users(), value).exists():
+            raise ValidationError("A user with that email already exists.")
+        return value
+
+    def validate_phone(self, value):
+        if value and self.get_live_users().filter(phone=value).exists():
+            raise ValidationError("A user with that phone number already exists.")
+        return value
+
+
+class UserSerializer(LiveUniqueMixin, ModelSerializer):
 
     class Meta:
         model = User
@@ -66,8 +98,8 @@ class UserSerializer(ModelSerializer):
         )
 
 
-class SignUpSerializer(ModelSerializer):
-    referral = CharField(required=False)
+class SignUpSerializer(LiveUniqueMixin, ModelSerializer):
+    referral = CharField(required=False, write_only=True)
 
     class Meta:
         model = User
@@ -79,6 +111,7 @@ class SignUpSerializer(ModelSerializer):
             'username',
             'password',
             'gender',
+            'referral',
         )
 
     def validate_password(self, value):
@@ -86,14 +119,20 @@ class SignUpSerializer(ModelSerializer):
         return value
 
     def create(self, validated_data, *args, **kwargs):
+        # everything is set before the single INSERT, the verification
+        # mail and sms are queued once the row is committed.
         password = validated_data.pop("password", None)
-        instance = super(SignUpSerializer, self).create(validated_data, *args, **kwargs)
+        validated_data.pop("referral", None)
+        instance = User(**validated_data)
         if password:
-            instance.set_password(password)
+            set_password(instance, password)
             instance.term_and_condition_accepted = True
-            instance.save()
             if instance.email:
-                instance.send_email_verification()
+                instance.prepare_email_verification()
+        instance.save(force_insert=True)
+        if password:
+            if instance.email:
+                instance.queue_email_verification()
             if instance.phone:
                 instance.send_otp()
         return instance
@@ -102,8 +141,8 @@ class SignUpSerializer(ModelSerializer):
         password = validated_data.pop("password", None)
         instance = super(SignUpSerializer, self).update(instance, validated_data, *args, **kwargs)
         if password:
-            instance.set_password(password)
-            instance.save()
+            set_password(instance, password)
+            instance.save(update_fields=['password'])
         return instance
 
 
@@ -118,11 +157,7 @@ class SignInSerializer(Serializer):
         activate = validated_data.get('activate')
         request = self.context['request']
         try:
-            user = User.objects.get(
-                Q(email=username)
-                | Q(phone=username)
-                | Q(username=username)
-            )
+            user = get_user_by_identifier(username)
         except User.DoesNotExist:
             raise ValidationError(
                 {
@@ -139,34 +174,41 @@ class SignInSerializer(Serializer):
         #     })
 
         if not user.is_active and user.deactivation_reason:
-            if activate:
-                user.is_active = True
-                user.deactivation_reason = None
-                user.save()
-            else:
+            if not activate:
                 raise ValidationError({
                     "deactivated-account": "Account deactivated."
                 })
-
         elif not user.is_active:
             raise ValidationError({
                 "account-blocked": "Your account is temporary blocked. Please connect with support"
             })
-        user = authenticate(username=user.email, password=password)
-        if user is None:
+        # the user is already loaded, so verify the password on it directly
+        # instead of letting authenticate() fetch the same row again.
+        if not user.check_password(password):
+            user_login_failed.send(
+                sender=__name__,
+                credentials={'username': username},
+                request=request
+            )
             raise ValidationError(
                 {
                     "wrong-credentials": "wrong credentials"
                 }
             )
-        login(request=request, user=user)
+        if not user.is_active:
+            user.is_active = True
+            user.deactivation_reason = None
+        old_meta, new_meta = user.get_diff()
+        user.save()
+        login(request=request, user=user, backend='django.contrib.auth.backends.ModelBackend')
         UnitOfHistory.user_history(
             action=HistoryActions.USER_SIGN_IN,
             user=user,
-            request=request
+            request=request,
+            old_meta=old_meta or None,
+            new_meta=new_meta or None
         )
-        Token.objects.filter(user=user).delete()
-        token = Token.objects.create(user=user)
+        token = rotate_token(user)
         data = UserSerializer(user).data
         data['token'] = token.key
         return data
@@ -199,15 +241,18 @@ class OTPSerializer(Serializer):
 
     def validate(self, data):
         phone = data['phone']
-        user = User.objects.filter(phone=phone).first()
-        if not user:
+        # the code is only used up together with the verification, a failed
+        # attempt is counted all the same.
+        with transaction.atomic():
+            verified = PhoneOTP.objects.verify(phone, data['otp'])
+            user = User.objects.filter(phone=phone).first() if verified else None
+            if user is not None and not user.is_phone_verified:
+                user.is_phone_verified = True
+                # a save, not update(), so the cached token user is dropped too.
+                user.save(update_fields=['is_phone_verified'])
+        if not verified:
             raise ValidationError({'otp-verify': "Invalid OTP"})
-        if user.otp == data['otp']:
-            user.otp = None
-            user.is_phone_verified = True
-            user.save()
-            return data
-        raise ValidationError({'otp-verify': "Invalid OTP"})
+        return data
 
 
 class ResendOtpSerializer(Serializer):
@@ -236,8 +281,8 @@ class ChangePasswordSerializer(Serializer):
         if not user.check_password(old_password):
             raise ValidationError({"password-change": "Wrong password."})
 
-        user.set_password(validated_data.get("new_password"))
-        user.save()
+        set_password(user, validated_data.get("new_password"))
+        user.save(update_fields=['password'])
         UnitOfHistory.user_history(
             action=HistoryActions.PASSWORD_CHANGE,
             user=user,
@@ -270,4 +315,37 @@ class UserDevicesTokenSerializer(ModelSerializer):
             ).exclude(
                 user=user
             ).delete()
-            return obj
\ No newline at end of file
+            return obj
+
+
+class BulkUserSerializer(Serializer):
+    """The users of a bulk operation, either by `ids` or by UserFilter `filters`."""
+    ids = ListField(child=IntegerField(min_value=1), required=False, allow_empty=False)
+    filters = DictField(required=False)
+
+    def validate_filters(self, value):
+        filterset = UserFilter(data=value, queryset=User.objects.all())
+        # the filterset drops unknown or invalid parameters, which would
+        # select every user.
+        unknown = set(value) - set(filterset.filters)
+        if unknown:
+            raise ValidationError(f"Unknown filters: {', '.join(sorted(unknown))}.")
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+        # a value which cleans to nothing (" ", is_active=maybe) is skipped
+        # by the filterset, it must not widen the selection.
+        cleaned_data = filterset.form.cleaned_data
+        names = [name for name in value if name != 'order_by']
+        empty = sorted(name for name in names if cleaned_data.get(name) in EMPTY_VALUES)
+        if empty:
+            raise ValidationError(f"Empty or invalid filters: {', '.join(empty)}.")
+        if not names:
+            raise ValidationError("At least one filter is required.")
+        return value
+
+    def validate(self, data):
+        if ('ids' in data) == ('filters' in data):
+            raise ValidationError({"bulk": "Send either ids or filters."})
+        if 'ids' in data:
+            data['ids'] = sorted(set(data['ids']))
+        return data
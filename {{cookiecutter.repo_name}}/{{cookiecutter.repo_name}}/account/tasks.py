@@ -1,6 +1,6 @@
 from {{cookiecutter.repo_name}}.celery import app
 from {{cookiecutter.repo_name}}.mail import send_mail_from_template
-from {{cookiecutter.repo_name}}.sms import send_otp
+from {{cookiecutter.repo_name}}.sms import gateway, send_otp
 
 
 @app.task
@@ -10,4 +10,35 @@ def send_email_on_delay(template, context, subject, email):
 
 @app.task
 def send_otp_on_delay(phone, otp):
-    send_otp(phone, otp)
\ No newline at end of file
+    send_otp(phone, otp)
+
+
+@app.task
+def send_sms_on_delay(messages):
+    """messages: [(phone, message), ...], sent concurrently."""
+    gateway.send_many(messages)
+
+
+@app.task
+def write_history_on_delay(entries):
+    from .history import write_history
+    write_history(entries)
+
+
+@app.task
+def send_campaign_on_delay(campaign_id):
+    from .campaigns import dispatch_campaign
+    dispatch_campaign(campaign_id, send_campaign_chunk_on_delay.delay)
+
+
+@app.task(acks_late=True)
+def send_campaign_chunk_on_delay(campaign_id, user_ids):
+    # acks_late: a chunk lost with its worker is delivered again.
+    from .campaigns import send_campaign_chunk
+    send_campaign_chunk(campaign_id, user_ids)
+
+
+@app.task
+def run_bulk_job_on_delay(job_id, kwargs):
+    from .moderation import run_bulk_job
+    run_bulk_job(job_id, kwargs)
@@ -1,3 +1,664 @@
-from django.test import TestCase
+import datetime
+import gzip
+import io
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.contrib.contenttypes.models import ContentType
+from django.core import mail
+from django.core.management import call_command
+from django.db import DatabaseError, connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django_rest_passwordreset.models import ResetPasswordToken
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from . import campaigns
+from .activity import ActivityTracker, activity_cache
+from .authentication import CACHED_USER_FIELDS, token_cache, token_key
+from .hashers import PasswordHashingService
+from .history import HistoryWriter, get_history_writer, write_history
+from ..core.constants import HistoryActions
+from ..core.paginations import estimated_count
+from ..core.throttling import throttle_cache
+from .choices import CampaignStatusChoices
+from .filters import UserFilter
+from .lookups import EMAIL, PHONE, USERNAME, get_user_by_identifier, resolve_identifier
+from .moderation import DELETE, run_bulk_operation
+from .partitions import (
+    create_partition, detach_partition, existing_partitions, partition_tables
+)
+from .models import MailCampaign, PhoneOTP, UnitOfHistory, User, UserAgent
+from .serializers import OTPSerializer
+from .tokens import rotate_token
+from .transfer import (
+    CSV,
+    EXPORT_FIELDS,
+    JSONL,
+    export_users,
+    import_users,
+    read_rows,
+    write_rows,
+)
+
+
+def use_local_cache(*caches):
+    """Run FallbackCaches on their empty in-process cache, no Redis in tests."""
+    for cache in caches:
+        cache.down_until = float('inf')
+        cache.local.data.clear()
+
+
+def make_user(username='testuser', **fields):
+    fields.setdefault('email', f'{username}@example.com')
+    fields.setdefault('password', '!')
+    return User.objects.create(username=username, **fields)
+
+
+class DirtyFieldsTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.get(id=make_user().id)
+
+    def test_save_writes_only_changed_fields(self):
+        self.user.name = 'Changed'
+        with CaptureQueriesContext(connection) as queries:
+            self.user.save()
+        self.assertEqual(len(queries), 1)
+        self.assertIn('"name"', queries[0]['sql'])
+        self.assertNotIn('"email"', queries[0]['sql'])
+
+    def test_save_without_changes_writes_nothing(self):
+        with self.assertNumQueries(0):
+            self.user.save()
+
+    def test_changes_left_out_of_update_fields_stay_dirty(self):
+        self.user.name = 'Changed'
+        self.user.is_phone_verified = True
+        self.user.save(update_fields=['name'])
+        self.assertEqual(self.user.get_dirty_fields(), {'is_phone_verified': False})
+        self.user.save()
+        self.assertTrue(User.objects.get(id=self.user.id).is_phone_verified)
+        self.assertEqual(self.user.get_dirty_fields(), {})
+
+    def test_saving_a_copy_inserts_a_row(self):
+        original_id = self.user.id
+        self.user.pk = None
+        self.user.username = 'copieduser'
+        self.user.email = 'copied@example.com'
+        self.user.save()
+        self.assertNotEqual(self.user.id, original_id)
+        self.assertEqual(User.objects.filter(id__in=[original_id, self.user.id]).count(), 2)
+
+    def test_diff_leaves_secrets_out(self):
+        self.user.name = 'Changed'
+        self.user.password = 'something-else'
+        self.assertEqual(self.user.get_diff(), ({'name': None}, {'name': 'Changed'}))
+
+
+class CachedTokenAuthenticationTests(TestCase):
+
+    def setUp(self):
+        use_local_cache(token_cache, throttle_cache, activity_cache)
+        # reset tokens are only accepted for users with a usable password.
+        self.user = make_user(phone='+8801700000001', password=make_password('Old-pass-word1'))
+        self.key = rotate_token(self.user).key
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.key}')
+        # the first request caches the user.
+        self.client.get('/api/v1/users/me/')
+
+    def test_only_the_authentication_fields_are_cached(self):
+        snapshot = token_cache.get(token_key(self.key))
+        self.assertEqual(set(snapshot), set(CACHED_USER_FIELDS))
+        self.assertNotIn('password', snapshot)
+
+    def test_cached_user_authenticates_without_queries(self):
+        # a non admin asking for a bulk job reads only request.user.
+        with self.assertNumQueries(0):
+            response = self.client.get(f'/api/v1/users/bulk-jobs/{"0" * 32}/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_cache_is_dropped_once_the_change_is_committed(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            User.objects.get(id=self.user.id).save(update_fields=['is_active'])
+            # a request before the commit would cache the old row again.
+            self.assertIsNotNone(token_cache.get(token_key(self.key)))
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(token_cache.get(token_key(self.key)))
+
+    def test_rotated_token_is_rejected(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            rotate_token(self.user)
+        self.assertEqual(self.client.get('/api/v1/users/me/').status_code, 401)
+
+    def test_profile_update_is_seen_by_the_next_request(self):
+        response = self.client.patch(
+            f'/api/v1/users/{self.user.id}/', {'name': 'Fresh'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/v1/users/me/').data['name'], 'Fresh')
+
+    def test_phone_verification_is_seen_by_the_next_request(self):
+        code = PhoneOTP.objects.issue(self.user.phone)
+        response = self.client.post(
+            '/api/v1/users/otp-verify/', {'phone': self.user.phone, 'otp': code}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(self.client.get('/api/v1/users/me/').data['is_phone_verified'])
+
+    def test_password_reset_is_seen_by_the_next_request(self):
+        reset = ResetPasswordToken.objects.create(user=self.user)
+        response = self.client.post(
+            '/api/v1/password_reset/confirm/', {'token': reset.key, 'password': 'N3w-pass-word!'}
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.client.patch(
+            '/api/v1/users/password-change/',
+            {'old_password': 'N3w-pass-word!', 'new_password': 'An0ther-pass-word!'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+def render_plain(template, contexts):
+    return [('Hello', '<p>Hello</p>')] * len(contexts)
+
+
+class MailCampaignTests(TestCase):
+
+    def setUp(self):
+        self.campaign = MailCampaign.objects.create(subject='News', template='mail/news.html')
+
+    def test_start_takes_the_campaign_once(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertTrue(self.campaign.start())
+            self.assertFalse(self.campaign.start())
+        self.assertEqual(len(callbacks), 1)
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.status, CampaignStatusChoices.SENDING)
+
+    def test_stalled_campaign_is_resumed_from_the_start(self):
+        MailCampaign.objects.filter(id=self.campaign.id).update(
+            status=CampaignStatusChoices.DISPATCHED, last_user_id=10, recipient_count=5
+        )
+        self.assertFalse(self.campaign.start())
+        MailCampaign.objects.filter(id=self.campaign.id).update(
+            updated=timezone.now() - timedelta(days=1)
+        )
+        self.assertTrue(self.campaign.start())
+        self.campaign.refresh_from_db()
+        self.assertEqual((self.campaign.last_user_id, self.campaign.recipient_count), (0, 0))
+
+    def test_completed_campaign_is_not_started(self):
+        MailCampaign.objects.filter(id=self.campaign.id).update(
+            status=CampaignStatusChoices.COMPLETED, updated=timezone.now() - timedelta(days=1)
+        )
+        self.assertFalse(self.campaign.start())
+
+    @mock.patch.object(campaigns, 'render_many', render_plain)
+    def test_redelivered_chunk_is_not_sent_or_counted_again(self):
+        user_ids = [make_user('first').id, make_user('second').id]
+        MailCampaign.objects.filter(id=self.campaign.id).update(
+            status=CampaignStatusChoices.DISPATCHED, recipient_count=2
+        )
+        campaigns.send_campaign_chunk(self.campaign.id, user_ids)
+        campaigns.send_campaign_chunk(self.campaign.id, user_ids)
+        self.assertEqual(len(mail.outbox), 2)
+        self.campaign.refresh_from_db()
+        self.assertEqual((self.campaign.sent_count, self.campaign.failed_count), (2, 0))
+        self.assertEqual(self.campaign.status, CampaignStatusChoices.COMPLETED)
+
+
+class SoftDeleteTests(TestCase):
+
+    def setUp(self):
+        use_local_cache(token_cache, throttle_cache, activity_cache)
+        self.users = [make_user(f'user{number}') for number in range(3)]
+        User.objects.filter(id=self.users[0].id).update(is_deleted=True)
+
+    def test_estimated_count_leaves_deleted_users_out(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE account_user')
+        self.assertEqual(estimated_count(User.objects.all()), 2)
+        self.assertEqual(estimated_count(User.all_objects.all()), 3)
+        self.assertIsNone(estimated_count(User.objects.filter(is_active=True)))
+
+    def test_deleting_a_deleted_user_is_refused(self):
+        admin = make_user('admin', is_staff=True)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {rotate_token(admin).key}')
+        response = client.delete(f'/api/v1/users/{self.users[0].id}/')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('deleted', response.data)
+        response = client.delete(f'/api/v1/users/{self.users[1].id}/')
+        self.assertEqual(response.status_code, 204)
+
+
+class UserListOrderingTests(TestCase):
+
+    def setUp(self):
+        use_local_cache(token_cache, throttle_cache, activity_cache)
+        admin = make_user('admin', is_staff=True)
+        for number in range(3):
+            make_user(f'user{number}')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {rotate_token(admin).key}')
+
+    def test_nullable_ordering_is_rejected(self):
+        for field in ('name', '-last_active_on'):
+            response = self.client.get('/api/v1/users/', {'order_by': field, 'cursor': ''})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('order_by', response.data)
+
+    def test_pages_follow_the_requested_ordering(self):
+        usernames = []
+        params = {'order_by': '-username', 'limit': 2, 'cursor': ''}
+        url = '/api/v1/users/'
+        while url:
+            data = self.client.get(url, params).data
+            self.assertIn('cursor=', data['next'] or 'cursor=')
+            usernames += [user['username'] for user in data['results']]
+            url, params = data['next'], None
+        self.assertEqual(usernames, ['user2', 'user1', 'user0', 'admin'])
+
+    def test_start_offsets_are_served_without_a_cursor(self):
+        data = self.client.get(
+            '/api/v1/users/', {'order_by': 'username', 'limit': 2, 'start': 1}
+        ).data
+        self.assertEqual(data['count'], 4)
+        self.assertEqual([user['username'] for user in data['results']], ['user0', 'user1'])
+        self.assertIn('start=3', data['next'])
+
+
+class PhoneOTPTests(TestCase):
+    phone = '+8801700000002'
+
+    def test_code_is_used_once(self):
+        code = PhoneOTP.objects.issue(self.phone)
+        self.assertTrue(PhoneOTP.objects.verify(self.phone, code))
+        self.assertFalse(PhoneOTP.objects.verify(self.phone, code))
+
+    def test_expired_code_is_refused(self):
+        code = PhoneOTP.objects.issue(self.phone)
+        PhoneOTP.objects.filter(phone=self.phone).update(expires=timezone.now())
+        self.assertFalse(PhoneOTP.objects.verify(self.phone, code))
+
+    def test_code_is_void_after_max_attempts(self):
+        code = PhoneOTP.objects.issue(self.phone)
+        for _ in range(settings.OTP_MAX_ATTEMPTS):
+            self.assertFalse(PhoneOTP.objects.verify(self.phone, 'wrong'))
+        self.assertFalse(PhoneOTP.objects.verify(self.phone, code))
+
+    def test_code_is_kept_when_the_verification_fails_to_save(self):
+        make_user(phone=self.phone)
+        code = PhoneOTP.objects.issue(self.phone)
+        serializer = OTPSerializer(data={'phone': self.phone, 'otp': code})
+        with mock.patch.object(User, 'save', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                serializer.is_valid()
+        self.assertTrue(PhoneOTP.objects.verify(self.phone, code))
+
+    def test_failed_attempt_is_counted(self):
+        PhoneOTP.objects.issue(self.phone)
+        serializer = OTPSerializer(data={'phone': self.phone, 'otp': 'wrong'})
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(PhoneOTP.objects.get(phone=self.phone).attempts, 1)
+
+
+class UserAgentTests(TestCase):
+
+    def setUp(self):
+        # ids known from other tests were rolled back with them.
+        UserAgent.objects.known_ids.clear()
+
+    def test_intern_inserts_each_value_once(self):
+        ids = UserAgent.objects.intern(['curl/8.0', 'Mozilla/5.0', 'curl/8.0'])
+        self.assertEqual(set(ids), {'curl/8.0', 'Mozilla/5.0'})
+        self.assertEqual(UserAgent.objects.count(), 2)
+        with self.assertNumQueries(0):
+            known = UserAgent.objects.intern(['Mozilla/5.0'])
+        self.assertEqual(known, {'Mozilla/5.0': ids['Mozilla/5.0']})
+
+    def test_intern_finds_values_forgotten_by_the_process(self):
+        ids = UserAgent.objects.intern(['curl/8.0'])
+        UserAgent.objects.known_ids.clear()
+        ids_again = UserAgent.objects.intern(['curl/8.0', 'Mozilla/5.0'])
+        self.assertEqual(ids_again['curl/8.0'], ids['curl/8.0'])
+
+
+class PasswordHashingServiceTests(TestCase):
+
+    def test_pool_hashes_in_order_within_the_pending_bound(self):
+        service = PasswordHashingService(workers=2, max_pending=1)
+        self.addCleanup(service.shutdown)
+        passwords = [f'password-{number}' for number in range(5)]
+        hashes = service.make_passwords(passwords)
+        self.assertTrue(all(map(check_password, passwords, hashes)))
+        self.assertTrue(check_password('single', service.make_password('single')))
+        # every pending slot was given back.
+        self.assertTrue(service.pending.acquire(blocking=False))
+
+
+class SignInTests(TestCase):
+
+    def setUp(self):
+        use_local_cache(token_cache, throttle_cache, activity_cache)
+        self.user = make_user(password=make_password('Old-pass-word1'))
+        self.client = APIClient()
+        # the history row is part of the counted queries.
+        patcher = mock.patch.object(get_history_writer(), 'mode', 'sync')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def sign_in(self):
+        return self.client.post(
+            '/api/v1/users/sign-in/', {'username': 'testuser', 'password': 'Old-pass-word1'}
+        )
+
+    def test_sign_in_queries(self):
+        # the first sign in creates the token and the session.
+        self.assertEqual(self.sign_in().status_code, 201)
+        # the user SELECT, the session SELECT, last_login UPDATE, the history
+        # INSERT, the token UPDATE and the session UPDATE (in a savepoint).
+        with self.assertNumQueries(8):
+            response = self.sign_in()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Token.objects.get(user=self.user).key, response.data['token'])
+
+    def test_rotate_token_rewrites_the_key_in_place(self):
+        first = rotate_token(self.user)
+        with self.assertNumQueries(1):
+            second = rotate_token(self.user)
+        self.assertNotEqual(first.key, second.key)
+        self.assertEqual(Token.objects.get(user=self.user).key, second.key)
+
+
+class UserFilterTests(TestCase):
+
+    def setUp(self):
+        make_user('jane', name='Jane Doe', phone='+8801711111111')
+        make_user('john', name='John 100% Doe', phone='+8801722222222')
+
+    def filter(self, **data):
+        queryset = UserFilter(data=data, queryset=User.objects.all()).qs
+        return sorted(queryset.values_list('username', flat=True))
+
+    def test_substring_filters_ignore_case(self):
+        self.assertEqual(self.filter(name='DOE'), ['jane', 'john'])
+        self.assertEqual(self.filter(email='JANE@'), ['jane'])
+        self.assertEqual(self.filter(phone='1722'), ['john'])
+        self.assertEqual(self.filter(name='0%'), ['john'])
+
+    def test_substring_filters_use_ilike(self):
+        queryset = UserFilter(data={'name': 'doe'}, queryset=User.objects.all()).qs
+        self.assertIn('"name" ILIKE', str(queryset.query))
+
+
+class TransferTests(TestCase):
+    fields = EXPORT_FIELDS + ('password',)
+
+    def setUp(self):
+        self.hashing = PasswordHashingService(workers=0)
+        make_user(
+            'janedoe', name='Jane', phone='+8801711111111', gender='female',
+            password=make_password('pw-1')
+        )
+        make_user('johndoe', password=make_password('pw-2'))
+
+    def get_users(self):
+        return list(User.all_objects.order_by('username').values(
+            'username', 'email', 'phone', 'name', 'gender', 'password'
+        ))
+
+    def import_users(self, rows):
+        errors = []
+        created = import_users(
+            rows, hashing=self.hashing, on_error=lambda line, messages: errors.append(line)
+        )
+        # rows are reported by the check they fail, not in file order.
+        return created, sorted(errors)
+
+    def round_trip(self, file_format):
+        stream = io.StringIO()
+        write_rows(stream, export_users(self.fields), self.fields, file_format)
+        before = self.get_users()
+        User.all_objects.all().delete()
+        stream.seek(0)
+        self.assertEqual(self.import_users(read_rows(stream, file_format)), (2, []))
+        self.assertEqual(self.get_users(), before)
+        self.assertTrue(User.objects.get(username='janedoe').check_password('pw-1'))
+
+    def test_csv_round_trip(self):
+        self.round_trip(CSV)
+
+    def test_jsonl_round_trip(self):
+        self.round_trip(JSONL)
+
+    def test_invalid_and_taken_rows_are_reported(self):
+        rows = [
+            {'username': 'newuser', 'email': 'new@example.com', 'password': 'raw-password'},
+            {'username': 'janedoe', 'email': 'other@example.com'},
+            {'username': 'bad name', 'email': 'not-an-email'},
+            {'username': 'againuser', 'email': 'NEW@example.com'},
+        ]
+        self.assertEqual(self.import_users(rows), (1, [2, 3, 4]))
+        self.assertTrue(User.objects.get(username='newuser').check_password('raw-password'))
+
+
+class ActivityTrackerTests(TestCase):
+
+    def setUp(self):
+        use_local_cache(activity_cache)
+        self.tracker = ActivityTracker(interval=300, batch_size=10, flush_interval=60)
+        self.addCleanup(self.tracker.flush)
+        self.user = make_user()
+
+    def test_activity_is_written_in_one_batch(self):
+        other = make_user('otheruser')
+        for user in (self.user, other, self.user):
+            self.tracker.touch(user)
+        with self.assertNumQueries(1):
+            self.tracker.flush()
+        self.assertEqual(User.objects.filter(last_active_on__isnull=False).count(), 2)
+
+    def test_touch_leaves_the_user_object_alone(self):
+        # with the local cache fallback this is the cached snapshot itself.
+        self.assertTrue(self.tracker.touch(self.user))
+        self.assertIsNone(self.user.last_active_on)
+        self.assertFalse(self.tracker.touch(self.user))
+        self.tracker.flush()
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_active_on)
+
+    def test_recent_activity_is_not_recorded_again(self):
+        self.user.last_active_on = timezone.now() - timedelta(seconds=10)
+        self.assertFalse(self.tracker.touch(self.user))
+        self.assertEqual(self.tracker.batch, {})
+
+
+class HistoryWriterTests(TestCase):
+
+    def setUp(self):
+        self.user = make_user()
+
+    def entry(self, user_id):
+        return {
+            'action': HistoryActions.USER_UPDATE,
+            'user_id': user_id,
+            'content_type_id': ContentType.objects.get_for_model(User).id,
+            'object_id': user_id,
+            'created': timezone.now(),
+        }
+
+    def test_entries_of_a_rolled_back_transaction_are_not_written(self):
+        writer = HistoryWriter(mode='buffer', batch_size=10, flush_interval=60)
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic():
+                    writer.write(self.entry(self.user.id))
+                    raise RuntimeError
+            writer.write(self.entry(self.user.id))
+        writer.flush()
+        self.assertEqual(UnitOfHistory.objects.count(), 1)
+
+    def test_invalid_entry_does_not_lose_the_batch(self):
+        missing_id = self.user.id + 1000
+        with self.assertLogs('{{cookiecutter.repo_name}}.account.history', 'ERROR'):
+            written = write_history([
+                self.entry(self.user.id), self.entry(missing_id), self.entry(self.user.id)
+            ])
+        self.assertEqual(len(written), 2)
+        self.assertEqual(
+            list(UnitOfHistory.objects.values_list('user_id', flat=True)),
+            [self.user.id, self.user.id]
+        )
+
+
+@override_settings(BULK_USER_CHUNK_SIZE=2)
+class BulkUserTests(TestCase):
+
+    def setUp(self):
+        use_local_cache(token_cache, throttle_cache, activity_cache)
+        self.admin = make_user('adminuser', is_staff=True)
+        self.users = [make_user(f'bulkuser{number}') for number in range(4)]
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {rotate_token(self.admin).key}')
+
+    def test_invalid_or_empty_filters_are_rejected(self):
+        for filters in (
+            {'is_active': 'maybe'},
+            {'email': ' '},
+            {'email': 'bulkuser', 'is_active': 'maybe'},
+            {'id': 'abc'},
+            {'unknown': 'x'},
+            {'order_by': 'id'},
+            {},
+        ):
+            response = self.client.post(
+                '/api/v1/users/bulk-delete/', {'filters': filters}, format='json'
+            )
+            self.assertEqual(response.status_code, 400, filters)
+            self.assertIn('filters', response.data)
+        self.assertEqual(User.objects.count(), 5)
+
+    def test_deactivate_by_ids_skips_the_acting_admin(self):
+        ids = [self.admin.id, *(user.id for user in self.users[:3])]
+        response = self.client.post(
+            '/api/v1/users/bulk-deactivate/', {'ids': ids}, format='json'
+        )
+        self.assertEqual(response.data, {'updated': 3})
+        self.assertEqual(
+            set(User.objects.filter(is_active=False).values_list('id', flat=True)),
+            set(ids[1:])
+        )
+        self.assertEqual(
+            UnitOfHistory.objects.filter(action=HistoryActions.USER_BLOCKED).count(), 3
+        )
+
+    def test_delete_by_filters_runs_in_chunks(self):
+        progress = []
+        updated = run_bulk_operation(
+            DELETE,
+            self.admin.id,
+            filters={'email': 'bulkuser'},
+            on_progress=lambda processed, updated: progress.append((processed, updated))
+        )
+        self.assertEqual(updated, 4)
+        self.assertEqual(progress, [(2, 2), (4, 4)])
+        self.assertEqual(list(User.objects.values_list('id', flat=True)), [self.admin.id])
+        self.assertEqual(
+            UnitOfHistory.objects.filter(action=HistoryActions.USER_DELETED).count(), 4
+        )
+        # a second run finds nothing left to change.
+        filters = {'email': 'bulkuser'}
+        self.assertEqual(run_bulk_operation(DELETE, self.admin.id, filters=filters), 0)
+
+
+class HistoryPartitionTests(TestCase):
+
+    def setUp(self):
+        self.user = make_user()
+
+    def write_entries(self, count, created=None):
+        write_history([
+            {
+                'action': HistoryActions.USER_UPDATE,
+                'user_id': self.user.id,
+                'content_type_id': ContentType.objects.get_for_model(User).id,
+                'object_id': self.user.id,
+                'created': created or timezone.now(),
+            }
+            for _ in range(count)
+        ])
+
+    def test_history_is_estimated_from_its_partitions(self):
+        self.write_entries(3)
+        # autovacuum analyzes the partitions, never the partitioned table.
+        with connection.cursor() as cursor:
+            for name in existing_partitions():
+                cursor.execute(f'ANALYZE {name}')
+        self.assertEqual(
+            estimated_count(UnitOfHistory.objects.all()), UnitOfHistory.objects.count()
+        )
+
+    def test_detached_partition_is_archived_by_a_later_run(self):
+        month = datetime.date(2001, 1, 1)
+        self.write_entries(2, created=timezone.make_aware(datetime.datetime(2001, 1, 15)))
+        name = create_partition(month)
+        detach_partition(name)
+        self.assertNotIn(name, existing_partitions())
+        with tempfile.TemporaryDirectory() as directory:
+            stdout = io.StringIO()
+            call_command('history_partitions', ahead=0, retention=1, stdout=stdout)
+            self.assertNotIn(name, stdout.getvalue())
+            call_command(
+                'history_partitions', ahead=0, retention=1, archive_dir=directory, stdout=stdout
+            )
+            self.assertIn(f"Archived {name}", stdout.getvalue())
+            with gzip.open(os.path.join(directory, f'{name}.csv.gz'), 'rt') as file:
+                self.assertEqual(len(file.readlines()), 3)
+        self.assertNotIn(name, partition_tables())
+
+
+class IdentifierLookupTests(TestCase):
+
+    def setUp(self):
+        self.user = make_user('jane', email='Jane@Example.com', phone='+8801711111111')
+
+    def test_identifier_kinds(self):
+        self.assertEqual(resolve_identifier('jane@example.com'), EMAIL)
+        self.assertEqual(resolve_identifier('+8801711111111'), PHONE)
+        self.assertEqual(resolve_identifier('8801711111111'), PHONE)
+        self.assertEqual(resolve_identifier('jane'), USERNAME)
+        self.assertEqual(resolve_identifier('jane2000'), USERNAME)
+
+    def test_user_is_found_by_every_identifier(self):
+        for identifier in ('jane', 'Jane@Example.com', '+8801711111111'):
+            self.assertEqual(get_user_by_identifier(identifier), self.user)
+
+    def test_email_ignores_case(self):
+        self.assertEqual(get_user_by_identifier('JANE@example.COM'), self.user)
+
+    def test_addresses_differing_by_case_fall_back_to_the_exact_one(self):
+        other = make_user('jane2', email='jane@example.com')
+        self.assertEqual(get_user_by_identifier('jane@example.com'), other)
+        self.assertEqual(get_user_by_identifier('Jane@Example.com'), self.user)
+        with self.assertRaises(User.DoesNotExist):
+            get_user_by_identifier('JANE@EXAMPLE.COM')
+
+    def test_deleted_users_are_only_found_in_all_objects(self):
+        User.objects.filter(id=self.user.id).update(is_deleted=True)
+        for identifier in ('jane', 'jane@example.com', '+8801711111111'):
+            with self.assertRaises(User.DoesNotExist):
+                get_user_by_identifier(identifier)
+            self.assertEqual(
+                get_user_by_identifier(identifier, User.all_objects.all()), self.user
+            )
@@ -0,0 +1,19 @@
+# at ./backend/account/tokens.py
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from .authentication import invalidate_token_cache
+
+
+def rotate_token(user) -> Token:
+    """
+    Replace the user's auth token with a fresh key.
+    The key is the primary key of Token, so an existing row is
+    rewritten in place with one UPDATE instead of DELETE + INSERT.
+    """
+    key = Token.generate_key()
+    created = timezone.now()
+    if not Token.objects.filter(user=user).update(key=key, created=created):
+        return Token.objects.create(user=user, key=key)
+    invalidate_token_cache(user.id)
+    return Token(key=key, user=user, created=created)
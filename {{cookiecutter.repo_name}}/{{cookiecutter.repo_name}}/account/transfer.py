@@ -0,0 +1,176 @@
+# at ./backend/account/transfer.py
+import csv
+import json
+
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX, identify_hasher
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db.models.functions import Lower
+
+from .choices import GenderChoices
+from .hashers import get_hashing_service
+from .models import User
+from ..core.models import to_json
+from ..core.utils import chunked
+from ..core.validators import username_validator
+
+CSV = 'csv'
+JSONL = 'jsonl'
+
+IMPORT_FIELDS = ('username', 'email', 'phone', 'name', 'gender', 'password')
+EXPORT_FIELDS = (
+    'id',
+    'username',
+    'email',
+    'phone',
+    'name',
+    'gender',
+    'is_active',
+    'is_deleted',
+    'is_email_verified',
+    'is_phone_verified',
+    'date_joined',
+    'last_active_on',
+)
+
+
+def get_format(path, file_format=None):
+    if file_format:
+        return file_format
+    return JSONL if path.endswith(('.jsonl', '.ndjson')) else CSV
+
+
+def read_rows(stream, file_format):
+    """Yield one dict per csv row or json line."""
+    if file_format == JSONL:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        yield from csv.DictReader(stream)
+
+
+def write_rows(stream, rows, fields, file_format):
+    if file_format == JSONL:
+        for row in rows:
+            stream.write(json.dumps(dict(zip(fields, map(to_json, row)))) + '\n')
+    else:
+        writer = csv.writer(stream)
+        writer.writerow(fields)
+        for row in rows:
+            writer.writerow(['' if value is None else to_json(value) for value in row])
+
+
+def clean_row(row) -> dict:
+    """Validate one import row, raises ValidationError with every problem."""
+    data = {field: str(row.get(field) or '').strip() or None for field in IMPORT_FIELDS}
+    errors = []
+    if not data['username']:
+        errors.append("username is required")
+    else:
+        try:
+            username_validator(data['username'])
+        except ValidationError as e:
+            errors.extend(e.messages)
+    if not data['email']:
+        errors.append("email is required")
+    else:
+        try:
+            validate_email(data['email'])
+        except ValidationError as e:
+            errors.extend(e.messages)
+    if data['phone']:
+        try:
+            User.phone_regex(data['phone'])
+        except ValidationError as e:
+            errors.extend(e.messages)
+    if data['gender'] and data['gender'] not in GenderChoices.values:
+        errors.append(f"gender must be one of {', '.join(GenderChoices.values)}")
+    if errors:
+        raise ValidationError(errors)
+    return data
+
+
+def find_existing(rows) -> set:
+    """usernames, emails and phones of the batch which are already taken,
+    deleted users only hold on to their username."""
+    usernames = [row['username'] for row in rows]
+    emails = [row['email'].lower() for row in rows]
+    phones = [row['phone'] for row in rows if row['phone']]
+    taken = set(User.all_objects.filter(username__in=usernames).values_list('username', flat=True))
+    taken.update(
+        User.objects.annotate(email_lower=Lower('email')).filter(
+            email_lower__in=emails
+        ).values_list('email_lower', flat=True)
+    )
+    taken.update(User.objects.filter(phone__in=phones).values_list('phone', flat=True))
+    return taken
+
+
+def is_password_hash(value):
+    if value.startswith(UNUSABLE_PASSWORD_PREFIX):
+        return True
+    try:
+        identify_hasher(value)
+        return True
+    except ValueError:
+        return False
+
+
+def hash_passwords(passwords, service):
+    # exported hashes are imported as they are.
+    hashed = [bool(password) and is_password_hash(password) for password in passwords]
+    raw = [password for password, is_hashed in zip(passwords, hashed) if not is_hashed]
+    hashes = iter(service.make_passwords(raw))
+    return [
+        password if is_hashed else next(hashes)
+        for password, is_hashed in zip(passwords, hashed)
+    ]
+
+
+def import_users(rows, batch_size=1000, hashing=None, on_error=None):
+    """
+    Validate and insert users batch by batch with bulk_create, passwords
+    are hashed by `hashing` (a PasswordHashingService). Rows which are
+    invalid or already taken are reported to on_error(line, errors) and
+    skipped. Returns the number of created users.
+    """
+    on_error = on_error or (lambda line, errors: None)
+    hashing = hashing or get_hashing_service()
+    created = 0
+    rows = enumerate(rows, start=1)
+    for batch in chunked(rows, batch_size):
+        cleaned = []
+        seen = set()
+        for line, row in batch:
+            try:
+                data = clean_row(row)
+            except ValidationError as e:
+                on_error(line, e.messages)
+                continue
+            keys = {data['username'], data['email'].lower(), data['phone']} - {None}
+            if keys & seen:
+                on_error(line, ["duplicate of an earlier row"])
+                continue
+            seen.update(keys)
+            cleaned.append((line, data))
+        taken = find_existing([data for line, data in cleaned])
+        users = []
+        for line, data in cleaned:
+            duplicates = {data['username'], data['email'].lower(), data['phone']} & taken
+            if duplicates:
+                on_error(line, [f"{value} already exists" for value in duplicates])
+                continue
+            users.append(User(**data))
+        hashes = hash_passwords([user.password for user in users], hashing)
+        for user, password in zip(users, hashes):
+            user.password = password
+        User.objects.bulk_create(users, batch_size=batch_size)
+        created += len(users)
+    return created
+
+
+def export_users(fields=EXPORT_FIELDS, chunk_size=2000, exclude_deleted=False):
+    """Stream rows in id order, a server-side cursor is used on postgres."""
+    queryset = User.objects.all() if exclude_deleted else User.all_objects.all()
+    return queryset.order_by('id').values_list(*fields).iterator(chunk_size=chunk_size)
@@ -4,7 +4,6 @@ from django.contrib.auth import get_user_model, login
 from django.dispatch import receiver
 
 # from django.urls import reverse
-from django.utils import timezone
 from django_rest_passwordreset.signals import reset_password_token_created
 from rest_framework import status
 from rest_framework.authtoken.models import Token
@@ -12,36 +11,40 @@ from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 
 from ..core.constants import HistoryActions
+from ..core.models import to_json
+from .authentication import invalidate_token_cache
 from .models import UnitOfHistory
+from .moderation import DELETE, get_changes
 from .serializers import UserSerializer
 from .tasks import send_email_on_delay
 
 User = get_user_model()
 
 
-def get_deleted_email(email):
-    if User.objects.filter(email__iexact=email).exists():
-        return get_deleted_email(f'deleted-{email}')
-    return email
-
-
-def delete_user(user, request):
+def delete_user(user, request) -> bool:
+    """
+    Soft delete with one UPDATE. The email and phone stay on the row, the
+    partial unique constraints only cover live users so they can be
+    registered again. Returns False if the user was already deleted.
+    """
     deleted_by = request.user
-    user.email = get_deleted_email(user.email)
-    if user.phone:
-        user.deleted_phone = user.phone
-    user.phone = None
-    user.is_deleted = True
-    user.deleted_on = timezone.now()
-    user.deleted_by = deleted_by
-    user.is_active = False
-    user.save()
+    changes = get_changes(DELETE)
+    if not User.objects.filter(pk=user.pk).update(**changes):
+        return False
+    old_meta = {field: to_json(getattr(user, field)) for field in changes}
+    new_meta = {field: to_json(value) for field, value in changes.items()}
+    for field, value in changes.items():
+        setattr(user, field, value)
+    invalidate_token_cache(user.id)
     UnitOfHistory.user_history(
         action=HistoryActions.USER_DELETED,
         request=request,
         user=deleted_by,
         perform_for=user,
+        old_meta=old_meta,
+        new_meta=new_meta,
     )
+    return True
 
 
 @receiver(reset_password_token_created)
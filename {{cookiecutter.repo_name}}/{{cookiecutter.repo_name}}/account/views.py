@@ -1,18 +1,25 @@
+from django.conf import settings
 from django.contrib.auth import logout
 from django.shortcuts import render
+from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import permissions, status
 from rest_framework.authtoken.models import Token
 from rest_framework.decorators import action
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.permissions import SAFE_METHODS
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet
 
 
-from ..core.paginations import LimitPagination
+from ..core.paginations import KeysetOrLimitPagination
+from ..core.throttling import EmailThrottle, IPThrottle, PhoneThrottle, UsernameThrottle
+from .authentication import invalidate_token_cache
 from .filters import UserFilter
+from .history import extract_headers
 from .models import User
+from .moderation import DEACTIVATE, DELETE, get_job, run_bulk_operation, start_bulk_job
 from .serializers import (
+    BulkUserSerializer,
     ChangePasswordSerializer,
     EmailSerializer,
     OTPSerializer,
@@ -25,24 +32,24 @@ from .utils import delete_user
 
 
 class UserViewSet(ModelViewSet):
+    filter_backends = (DjangoFilterBackend,)
     filterset_class = UserFilter
-    pagination_class = LimitPagination
+    pagination_class = KeysetOrLimitPagination
     permission_classes = (permissions.IsAuthenticated,)
     serializer_class = UserSerializer
+    throttle_scope = None  # set per action, see core.throttling
 
     def get_queryset(self):
-        qs = User.objects.all()
+        # destroy finds deleted users too, to answer "already deleted" instead of 404.
+        qs = (User.all_objects if self.action == 'destroy' else User.objects).all()
         if self.request.user.is_admin:
             return qs
-        else:
-            qs = qs.filter(id=self.request.user.id)
+        return qs.filter(id=self.request.user.id)
 
     def destroy(self, request, *args, **kwargs):
         if request.user.is_admin:
             user = self.get_object()
-            if not user.is_deleted:
-                delete_user(user, request)
-                user.save()
+            if delete_user(user, request):
                 return Response(status=status.HTTP_204_NO_CONTENT)
             raise ValidationError(
                 {
@@ -56,12 +63,54 @@ class UserViewSet(ModelViewSet):
                 }
             )
 
+    def bulk_operation(self, request, operation):
+        """
+        Small id lists are applied right away, larger ones and filters are
+        run by a celery task whose progress is polled from bulk-jobs/<id>/.
+        """
+        if not request.user.is_admin:
+            raise ValidationError(
+                {
+                    "permission-deny": "Permission required!"
+                }
+            )
+        serializer = BulkUserSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        kwargs = {
+            **serializer.validated_data,
+            'header': extract_headers(request.META),
+            'user_agent': request.META.get('HTTP_USER_AGENT'),
+        }
+        ids = kwargs.get('ids')
+        if ids is not None and len(ids) <= settings.BULK_USER_SYNC_LIMIT:
+            updated = run_bulk_operation(operation, request.user.id, **kwargs)
+            return Response({'updated': updated})
+        job = start_bulk_job(operation, request.user.id, **kwargs)
+        return Response(job, status=status.HTTP_202_ACCEPTED)
+
+    @action(url_path='bulk-delete', detail=False, methods=['POST'])
+    def bulk_delete(self, request, **kwargs):
+        return self.bulk_operation(request, DELETE)
+
+    @action(url_path='bulk-deactivate', detail=False, methods=['POST'])
+    def bulk_deactivate(self, request, **kwargs):
+        return self.bulk_operation(request, DEACTIVATE)
+
+    @action(url_path='bulk-jobs/(?P<job_id>[a-f0-9]{32})', detail=False, methods=['GET'])
+    def bulk_job(self, request, job_id, **kwargs):
+        job = get_job(job_id) if request.user.is_admin else None
+        if job is None:
+            raise NotFound({"bulk-job": "Job not found or expired."})
+        return Response(job)
+
     @action(url_path='me', detail=False, methods=['GET'])
     def me(self, request, **kwargs):
-        user = request.user
+        # request.user may be the token cache's snapshot, without the profile.
+        user = User.objects.get(pk=request.user.pk)
         return Response(UserSerializer(user).data)
 
-    @action(url_path='sign-up', detail=False, methods=['POST'], permission_classes=(permissions.AllowAny,))
+    @action(url_path='sign-up', detail=False, methods=['POST'],
+            permission_classes=(permissions.AllowAny,))
     def sign_up(self, request, **kwargs):
         """Create New User"""
         serializer = SignUpSerializer(data=request.data)
@@ -69,7 +118,9 @@ class UserViewSet(ModelViewSet):
         obj = serializer.save()
         return Response(UserSerializer(obj).data, status=status.HTTP_201_CREATED)
 
-    @action(url_path='sign-in', detail=False, methods=['POST'], permission_classes=(permissions.AllowAny,))
+    @action(url_path='sign-in', detail=False, methods=['POST'],
+            permission_classes=(permissions.AllowAny,),
+            throttle_scope='sign_in', throttle_classes=(IPThrottle, UsernameThrottle))
     def sign_in(self, request, **kwargs):
         """Login As user"""
         serializer = SignInSerializer(data=request.data, context={'request': request})
@@ -77,15 +128,14 @@ class UserViewSet(ModelViewSet):
         obj = serializer.save()
         return Response(obj, status=status.HTTP_201_CREATED)
 
-    @action(url_path='sign-out', detail=False, methods=['GET'], permission_classes=(permissions.IsAuthenticated,))
+    @action(url_path='sign-out', detail=False, methods=['GET'],
+            permission_classes=(permissions.IsAuthenticated,))
     def sign_out(self, request, **kwargs):
         """Logout with current session"""
         session_type = request.GET.get('session_type', 'app')
         if session_type in ['all', 'app']:
-            try:
-                Token.objects.get(user=request.user).delete()
-            except Token.DoesNotExist:
-                pass
+            Token.objects.filter(user=request.user).delete()
+            invalidate_token_cache(request.user.id)
         if session_type in ['all', 'web']:
             logout(request)
         return Response(
@@ -108,7 +158,7 @@ class UserViewSet(ModelViewSet):
             user = User.objects.get(activation_token=token)
             user.activation_token = None
             user.is_email_verified = True
-            user.save()
+            user.save(update_fields=['activation_token', 'is_email_verified'])
             message = "Your email has been successfully verified."
             return render(
                 self.request,
@@ -129,30 +179,36 @@ class UserViewSet(ModelViewSet):
                 }
             )
 
-    @action(url_path='otp-verify', methods=['POST'], detail=False, permission_classes=(permissions.AllowAny,))
+    @action(url_path='otp-verify', methods=['POST'], detail=False,
+            permission_classes=(permissions.AllowAny,),
+            throttle_scope='otp_verify', throttle_classes=(IPThrottle, PhoneThrottle))
     def opt_verify(self, request, **kwargs):
         serializer = OTPSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         return Response({'message': 'Verified successful'})
 
-    @action(url_path='add-phone', detail=False, methods=['PATCH'])
+    @action(url_path='add-phone', detail=False, methods=['PATCH'],
+            throttle_scope='otp_resend', throttle_classes=(IPThrottle, PhoneThrottle))
     def add_phone(self, request, **kwargs):
         phone = request.data.get('phone')
-        user = request.user
+        user = User.objects.get(pk=request.user.pk)
         user.phone = phone
         user.is_phone_verified = False
-        user.save()
+        user.save(update_fields=['phone', 'is_phone_verified'])
         user.send_otp()
         return Response(UserSerializer(user).data)
 
-    @action(url_path='resend-otp', methods=['POST'], detail=False, permission_classes=(permissions.AllowAny,))
+    @action(url_path='resend-otp', methods=['POST'], detail=False,
+            permission_classes=(permissions.AllowAny,),
+            throttle_scope='otp_resend', throttle_classes=(IPThrottle, PhoneThrottle))
     def resend_otp(self, request, **kwargs):
         serializer = ResendOtpSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         return Response({'message': 'Send successful'})
 
     @action(url_path="resend-email-verification", detail=False, methods=["POST"],
-            permission_classes=(permissions.AllowAny,))
+            permission_classes=(permissions.AllowAny,),
+            throttle_scope='email_resend', throttle_classes=(IPThrottle, EmailThrottle))
     def resend_email_verification(self, request, *args, **kwargs):
         serializer = EmailSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -1,3 +1,84 @@
+import datetime
+import functools
+
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
+from django.core.paginator import Paginator
+from django.db.models import Max, Min
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .paginations import estimated_count
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator which takes the row count of an unfiltered changelist from the
+    planner statistics, so opening a large table doesn't run COUNT(*).
+    """
+
+    @cached_property
+    def count(self):
+        count = estimated_count(self.object_list)
+        if count is None or count < 10000:
+            # filtered lists and small tables are counted exactly.
+            return super().count
+        return count
+
+
+class DateBoundsQuerySetMixin:
+    """
+    Build the date hierarchy choices from the first and last date of the
+    queryset (two index lookups) instead of a DISTINCT over every row.
+    Choices without rows simply show an empty page.
+    """
+
+    def _date_choices(self, field_name, kind):
+        bounds = self.aggregate(first=Min(field_name), last=Max(field_name))
+        first, last = bounds['first'], bounds['last']
+        if first is None or last is None:
+            return []
+        if isinstance(first, datetime.datetime):
+            if timezone.is_aware(first):
+                first, last = timezone.localtime(first), timezone.localtime(last)
+            first, last = first.date(), last.date()
+        if kind == 'year':
+            return [datetime.date(year, 1, 1) for year in range(first.year, last.year + 1)]
+        if kind == 'month':
+            months = range(first.year * 12 + first.month - 1, last.year * 12 + last.month)
+            return [datetime.date(month // 12, month % 12 + 1, 1) for month in months]
+        return [first + datetime.timedelta(days=day) for day in range((last - first).days + 1)]
+
+    def dates(self, field_name, kind, order='ASC'):
+        choices = self._date_choices(field_name, kind)
+        return choices if order == 'ASC' else choices[::-1]
+
+    def datetimes(self, field_name, kind, order='ASC', tzinfo=None, is_dst=None):
+        return self.dates(field_name, kind, order)
+
+
+@functools.lru_cache(maxsize=None)
+def date_bounds_queryset_class(queryset_class):
+    name = f'DateBounds{queryset_class.__name__}'
+    return type(name, (DateBoundsQuerySetMixin, queryset_class), {})
+
+
+class PerformanceChangeList(ChangeList):
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if self.date_hierarchy:
+            queryset.__class__ = date_bounds_queryset_class(queryset.__class__)
+        return queryset
+
+
+class PerformanceModelAdmin(admin.ModelAdmin):
+    """
+    Base admin for large tables: estimated counts, no full result count
+    and a date hierarchy which doesn't scan the table.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
-# Register your models here.
+    def get_changelist(self, request, **kwargs):
+        return PerformanceChangeList
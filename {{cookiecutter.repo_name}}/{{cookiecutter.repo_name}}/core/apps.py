@@ -5,3 +5,10 @@ class CoreConfig(AppConfig):
     name = '{{cookiecutter.repo_name}}.core'
     label = 'core'
     verbose_name = 'Cores'
+
+    def ready(self):
+        from django.db.models import CharField
+
+        from .lookups import TrigramIContains
+
+        CharField.register_lookup(TrigramIContains)
@@ -0,0 +1,80 @@
+import atexit
+import logging
+import threading
+import weakref
+
+from celery.signals import worker_process_shutdown
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+_writers = weakref.WeakSet()
+
+
+class BatchWriter:
+    """
+    Collect items in memory and write them in batches, once `batch_size`
+    items are pending or `flush_interval` seconds passed since the first.
+    Subclasses implement write_batch(), and new_batch()/add_to_batch() when
+    the pending items aren't a plain list. Pending items are written on
+    process shutdown.
+    """
+    error_message = "Failed to write a batch of %s items."
+
+    def __init__(self, batch_size=100, flush_interval=5):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.batch = self.new_batch()
+        self.lock = threading.Lock()
+        self.timer = None
+        _writers.add(self)
+
+    def new_batch(self):
+        return []
+
+    def add_to_batch(self, batch, item):
+        batch.append(item)
+
+    def write_batch(self, batch):
+        raise NotImplementedError('.write_batch() must be overridden')
+
+    def add(self, item):
+        with self.lock:
+            self.add_to_batch(self.batch, item)
+            is_full = len(self.batch) >= self.batch_size
+            if not is_full and self.timer is None:
+                self.timer = threading.Timer(self.flush_interval, self._flush_on_timer)
+                self.timer.daemon = True
+                self.timer.start()
+        if is_full:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            batch, self.batch = self.batch, self.new_batch()
+        if not batch:
+            return
+        try:
+            self.write_batch(batch)
+        except Exception:
+            logger.exception(self.error_message, len(batch))
+
+    def _flush_on_timer(self):
+        try:
+            self.flush()
+        finally:
+            # timer threads open their own database connection.
+            connection.close()
+
+
+def flush_batch_writers(*args, **kwargs):
+    """Write whatever is still pending, called on process shutdown."""
+    for writer in list(_writers):
+        writer.flush()
+
+
+atexit.register(flush_batch_writers)
+worker_process_shutdown.connect(flush_batch_writers)
@@ -0,0 +1,122 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+
+class LocalLRUCache:
+    """
+    Small thread safe in-process cache with per key expiry.
+    The least recently used key is dropped once max_size is reached.
+    """
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _get(self, key):
+        item = self.data.get(key)
+        if item is None:
+            return None
+        value, expires = item
+        if expires is not None and expires <= time.monotonic():
+            del self.data[key]
+            return None
+        self.data.move_to_end(key)
+        return item
+
+    def _set(self, key, value, timeout):
+        self.data[key] = (value, time.monotonic() + timeout if timeout is not None else None)
+        self.data.move_to_end(key)
+        while len(self.data) > self.max_size:
+            self.data.popitem(last=False)
+
+    def get(self, key, default=None):
+        with self.lock:
+            item = self._get(key)
+        return default if item is None else item[0]
+
+    def get_many(self, keys) -> dict:
+        with self.lock:
+            items = {key: self._get(key) for key in keys}
+        return {key: item[0] for key, item in items.items() if item is not None}
+
+    def set(self, key, value, timeout=None):
+        with self.lock:
+            self._set(key, value, timeout)
+
+    def add(self, key, value, timeout=None) -> bool:
+        with self.lock:
+            if self._get(key) is not None:
+                return False
+            self._set(key, value, timeout)
+            return True
+
+    def incr(self, key, delta=1):
+        with self.lock:
+            item = self._get(key)
+            if item is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = item[0] + delta
+            self.data[key] = (value, item[1])
+            return value
+
+    def delete(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def delete_many(self, keys):
+        with self.lock:
+            for key in keys:
+                self.data.pop(key, None)
+
+
+class FallbackCache:
+    """
+    Use a django cache (Redis) and fall back to a LocalLRUCache while it is
+    unreachable. After a failure the shared cache is skipped for
+    `retry_after` seconds so requests don't wait on connection timeouts.
+    """
+
+    def __init__(self, alias='default', max_size=10000, retry_after=30):
+        self.alias = alias
+        self.local = LocalLRUCache(max_size=max_size)
+        self.retry_after = retry_after
+        self.down_until = 0
+
+    def _call(self, method, *args, **kwargs):
+        if self.down_until <= time.monotonic():
+            try:
+                return getattr(caches[self.alias], method)(*args, **kwargs)
+            except ValueError:
+                raise
+            except Exception as e:
+                logger.warning("Cache '%s' unavailable, using local cache: %s", self.alias, e)
+                self.down_until = time.monotonic() + self.retry_after
+        return getattr(self.local, method)(*args, **kwargs)
+
+    def get(self, key, default=None):
+        return self._call('get', key, default)
+
+    def get_many(self, keys) -> dict:
+        return self._call('get_many', keys)
+
+    def set(self, key, value, timeout=None):
+        return self._call('set', key, value, timeout)
+
+    def add(self, key, value, timeout=None) -> bool:
+        return self._call('add', key, value, timeout)
+
+    def incr(self, key, delta=1):
+        return self._call('incr', key, delta)
+
+    def delete(self, key):
+        return self._call('delete', key)
+
+    def delete_many(self, keys):
+        return self._call('delete_many', keys)
@@ -1,8 +1,68 @@
+import logging
+
+from django.conf import settings
+from django.db.models import Index
 from django_filters import rest_framework as filters
+from rest_framework.exceptions import ValidationError
+
+logger = logging.getLogger(__name__)
+
+
+def parse_ordering(value, allowed_fields):
+    """
+    Turn "name,-date_joined" into ["name", "-date_joined"].
+    Fields outside allowed_fields are rejected with a 400.
+    """
+    ordering = []
+    for item in value.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        if item.lstrip('-') not in allowed_fields:
+            raise ValidationError(
+                {"order_by": f"Ordering by '{item.lstrip('-')}' is not allowed."}
+            )
+        ordering.append(item)
+    return ordering
+
+
+def add_tiebreaker(ordering, model):
+    """Append the primary key so rows with equal sort values keep a stable order."""
+    pk_name = model._meta.pk.name
+    if any(item.lstrip('-') in (pk_name, 'pk') for item in ordering):
+        return ordering
+    return [*ordering, f"{'-' if ordering[0].startswith('-') else ''}{pk_name}"]
+
+
+def is_indexed(model, field_name):
+    """Whether an index starts with field_name, so the database can sort on it."""
+    field = model._meta.get_field(field_name)
+    if field.primary_key or field.unique or field.db_index:
+        return True
+    for index in model._meta.indexes:
+        # only plain btree indexes can serve an ORDER BY.
+        if type(index) is Index and index.fields and index.fields[0].lstrip('-') == field_name:
+            return True
+    return False
 
 
 class BaseOrderBy(filters.FilterSet):
+    """
+    Sort with `order_by=field,-other_field`.
+    Only the fields listed in `ordering_fields` can be used.
+    """
     order_by = filters.CharFilter(method="order_by_filter")
+    ordering_fields = ('id',)
 
     def order_by_filter(self, qs, name, value):
-        return qs.order_by(value)
\ No newline at end of file
+        ordering = parse_ordering(value, self.ordering_fields)
+        if not ordering:
+            return qs
+        field_name = ordering[0].lstrip('-')
+        if settings.DEBUG and not is_indexed(qs.model, field_name):
+            logger.warning(
+                "%s is ordered by '%s' which has no supporting index.",
+                qs.model.__name__,
+                field_name
+            )
+        return qs.order_by(*add_tiebreaker(ordering, qs.model))
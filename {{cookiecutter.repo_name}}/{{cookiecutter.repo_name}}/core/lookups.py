@@ -0,0 +1,22 @@
+from django.db.models.lookups import IContains
+
+
+class TrigramIContains(IContains):
+    """
+    `field__trigram_icontains=value`, icontains written as
+    `column ILIKE '%value%'` on PostgreSQL. icontains compiles to
+    UPPER(column) LIKE, which a gin_trgm_ops index on the column can't
+    serve, ILIKE on the bare column can. Registered in CoreConfig.ready().
+    """
+    lookup_name = 'trigram_icontains'
+
+    def as_sql(self, compiler, connection):
+        # other databases and expression values are compared with icontains.
+        return compiler.compile(IContains(self.lhs, self.rhs))
+
+    def as_postgresql(self, compiler, connection):
+        if not self.rhs_is_direct_value():
+            return self.as_sql(compiler, connection)
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} ILIKE {rhs}', [*lhs_params, *rhs_params]
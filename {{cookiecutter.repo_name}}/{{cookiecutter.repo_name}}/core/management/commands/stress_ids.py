@@ -0,0 +1,73 @@
+import collections
+import random
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from ...models import ReservedCode
+from ...utils import next_sequence_value, reserve_code
+
+
+class Command(BaseCommand):
+    help = "Generate ids from many threads at once and check that none of them collide."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--count', type=int, default=500, help="Ids per thread.")
+
+    def run(self, threads, work):
+        def task(index):
+            try:
+                return work(index)
+            finally:
+                # every thread has its own database connection.
+                connection.close()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            results = list(pool.map(task, range(threads)))
+        return results, time.perf_counter() - start
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("Sequences require PostgreSQL.")
+        threads, count = options['threads'], options['count']
+        run_id = uuid.uuid4().hex[:8]
+
+        # sequence numbers: every value must be handed out once.
+        sequence = f'stress_{run_id}'
+        results, elapsed = self.run(
+            threads, lambda index: [next_sequence_value(sequence) for _ in range(count)]
+        )
+        numbers = [number for result in results for number in result]
+        duplicates = len(numbers) - len(set(numbers))
+        self.stdout.write(
+            f"sequence: {len(numbers)} ids, {len(numbers) / elapsed:.0f}/s, "
+            f"{duplicates} duplicates"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP SEQUENCE seq_{sequence}')
+
+        # reservations: all threads race for the same values, each value
+        # must be won by exactly one of them.
+        namespace = f'stress.{run_id}'
+
+        def reserve(index):
+            values = list(range(count))
+            random.shuffle(values)
+            return [str(value) for value in values if reserve_code(namespace, str(value))]
+        results, elapsed = self.run(threads, reserve)
+        winners = collections.Counter(value for result in results for value in result)
+        attempts = threads * count
+        wrong = [value for value in map(str, range(count)) if winners[value] != 1]
+        self.stdout.write(
+            f"reserve: {attempts} attempts, {attempts / elapsed:.0f}/s, "
+            f"{len(wrong)} values not won exactly once"
+        )
+        ReservedCode.objects.filter(namespace=namespace).delete()
+
+        if duplicates or wrong:
+            raise CommandError("Collisions found.")
+        self.stdout.write(self.style.SUCCESS("No collisions."))
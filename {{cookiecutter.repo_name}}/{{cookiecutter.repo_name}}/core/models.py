@@ -1,9 +1,139 @@
+import copy
+
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.db.models.fields.files import FieldFile
 
 # Create your models here.
 
 
-class BaseModel(models.Model):
+def to_json(value):
+    """JSON friendly value for the audit history."""
+    if value is None or isinstance(value, (str, int, float, bool, list, dict)):
+        return value
+    try:
+        return DjangoJSONEncoder().default(value)
+    except TypeError:
+        return str(value)
+
+
+def copy_value(value):
+    if isinstance(value, FieldFile):
+        return value.name
+    if isinstance(value, (dict, list)):
+        return copy.deepcopy(value)
+    return value
+
+
+class DirtyFieldsMixin:
+    """
+    Remember the column values a row was loaded with, so save() on an
+    existing row only writes the changed columns (plus auto_now fields).
+    An explicit update_fields is respected as is.
+
+    get_diff() returns the changes as (old, new) dicts, ready for the
+    history's old_meta/new_meta. Fields in `diff_exclude` are left out.
+    """
+    diff_exclude = ()
+
+    def _snapshot(self, fields=None):
+        # deferred fields aren't in __dict__ and aren't tracked.
+        return {
+            field.name: copy_value(self.__dict__[field.attname])
+            for field in self._meta.concrete_fields
+            if not field.primary_key
+            and field.attname in self.__dict__
+            and (fields is None or field.name in fields or field.attname in fields)
+        }
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = instance._snapshot()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        self._loaded_values = {**getattr(self, '_loaded_values', {}), **self._snapshot(fields)}
+
+    def get_dirty_fields(self) -> dict:
+        """Changed fields mapped to the value they were loaded with."""
+        if self._state.adding:
+            return {}
+        loaded_values = getattr(self, '_loaded_values', {})
+        dirty = {}
+        for field in self._meta.concrete_fields:
+            if field.primary_key or field.attname not in self.__dict__:
+                continue
+            if field.name not in loaded_values:
+                # a deferred field which was assigned, the old value is unknown.
+                dirty[field.name] = None
+            elif self.__dict__[field.attname] != loaded_values[field.name]:
+                dirty[field.name] = loaded_values[field.name]
+        return dirty
+
+    def get_diff(self):
+        old_meta, new_meta = {}, {}
+        for name, old_value in self.get_dirty_fields().items():
+            if name in self.diff_exclude:
+                continue
+            old_meta[name] = to_json(old_value)
+            new_meta[name] = to_json(getattr(self, self._meta.get_field(name).attname))
+        return old_meta, new_meta
+
+    def save(self, *args, **kwargs):
+        if (
+            not args
+            and kwargs.get('update_fields') is None
+            and not kwargs.get('force_insert')
+            and not self._state.adding
+            # obj.pk = None; obj.save() inserts a copy.
+            and self.pk is not None
+            and hasattr(self, '_loaded_values')
+        ):
+            dirty = self.get_dirty_fields()
+            kwargs['update_fields'] = [*dirty, *(
+                field.name for field in self._meta.concrete_fields
+                if getattr(field, 'auto_now', False) and field.name not in dirty
+            )] if dirty else []
+        super().save(*args, **kwargs)
+        # only the written columns are clean now, changes left out of
+        # update_fields are still saved by the next save().
+        update_fields = kwargs.get('update_fields', args[3] if len(args) > 3 else None)
+        self._loaded_values = {
+            **getattr(self, '_loaded_values', {}),
+            **self._snapshot(update_fields),
+        }
+
+
+class ReservedCode(models.Model):
+    """
+    Values handed out by the unique code generators in core.utils (slugs,
+    referral codes, ...). A value is taken by whoever inserts it first, see
+    reserve_code.
+    """
+    namespace = models.CharField(
+        max_length=100
+    )  # e.g. "account.user.referral_code"
+    value = models.CharField(
+        max_length=255
+    )
+    created = models.DateTimeField(
+        auto_now_add=True
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['namespace', 'value'], name='core_reservedcode_unique'
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.namespace}: {self.value}'
+
+
+class BaseModel(DirtyFieldsMixin, models.Model):
     created = models.DateTimeField(
         auto_now_add=True
     )
@@ -12,4 +142,4 @@ class BaseModel(models.Model):
     )
 
     class Meta:
-        abstract = True
\ No newline at end of file
+        abstract = True
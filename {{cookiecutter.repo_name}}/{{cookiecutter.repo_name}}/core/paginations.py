@@ -1,6 +1,170 @@
-from rest_framework.pagination import LimitOffsetPagination
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import (
+    BasePagination, CursorPagination, LimitOffsetPagination
+)
+from rest_framework.response import Response
+
+from .filters import add_tiebreaker, parse_ordering
+
+
+def get_estimate_relation(queryset):
+    """
+    The table, or the partial index, whose row count is the size of the
+    queryset. Querysets filtered like a manager with an `estimate_relation`
+    (e.g. User.objects) are counted by that relation, other filters have
+    none.
+    """
+    if not queryset.query.where:
+        return queryset.model._meta.db_table
+    for manager in queryset.model._meta.managers:
+        relation = getattr(manager, 'estimate_relation', None)
+        if relation and manager.get_queryset().query.where == queryset.query.where:
+            return relation
+    return None
+
+
+def estimated_count(queryset):
+    """
+    Row count estimate of an unfiltered queryset taken from the
+    planner statistics (pg_class.reltuples) instead of COUNT(*).
+    Returns None when no estimate is available.
+
+    Autovacuum never analyzes a partitioned table itself, only its
+    partitions, so those are summed. A partition which was never analyzed
+    (e.g. an empty one of a coming month) counts as empty, unless none was.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    relation = get_estimate_relation(queryset)
+    if relation is None:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT CASE WHEN relation.relkind = 'p' THEN ("
+            "  SELECT CASE WHEN max(leaf.reltuples) < 0 THEN -1"
+            "  ELSE sum(greatest(leaf.reltuples, 0)) END"
+            "  FROM pg_partition_tree(relation.oid) tree"
+            "  JOIN pg_class leaf ON leaf.oid = tree.relid WHERE tree.isleaf"
+            ") ELSE relation.reltuples END::bigint "
+            "FROM pg_class relation WHERE relation.oid = %s::regclass",
+            [relation]
+        )
+        row = cursor.fetchone()
+    # reltuples is -1 for tables which were never analyzed.
+    return row[0] if row and row[0] is not None and row[0] >= 0 else None
 
 
 class LimitPagination(LimitOffsetPagination):
     page_size_query_param = 'limit'
-    offset_query_param = "start"
\ No newline at end of file
+    offset_query_param = "start"
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination which seeks on the ordering column instead of
+    scanning OFFSET rows, so deep pages cost the same as the first one.
+    The ordering comes from the `order_by` parameter of the view's
+    BaseOrderBy filterset and is limited to its ordering_fields, ordering
+    by a nullable column is rejected.
+    The total is only counted with `count=true`, otherwise an estimate is
+    returned for unfiltered lists.
+    """
+    page_size = 20
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    ordering = 'id'
+    ordering_query_param = 'order_by'
+    count_query_param = 'count'
+
+    def get_ordering(self, request, queryset, view):
+        value = request.query_params.get(self.ordering_query_param)
+        filterset_class = getattr(view, 'filterset_class', None)
+        # the cursor position is the value of the first ordering column,
+        # which can't be NULL.
+        if value and filterset_class is not None:
+            ordering = parse_ordering(value, filterset_class.ordering_fields)
+            if ordering and self.is_nullable(queryset.model, ordering[0].lstrip('-')):
+                raise ValidationError(
+                    {"order_by": f"Ordering by '{ordering[0].lstrip('-')}' is not supported."}
+                )
+        else:
+            # keep an ordering set by a filter, e.g. search rank.
+            ordering = [item for item in queryset.query.order_by if isinstance(item, str)]
+        if not ordering or self.is_nullable(queryset.model, ordering[0].lstrip('-')):
+            return super().get_ordering(request, queryset, view)
+        return tuple(add_tiebreaker(ordering, queryset.model))
+
+    def is_nullable(self, model, name):
+        try:
+            return model._meta.get_field(name).null
+        except FieldDoesNotExist:
+            # annotations such as search rank.
+            return False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if request.query_params.get(self.count_query_param) in ('true', '1'):
+            self.count = queryset.count()
+        else:
+            self.count = estimated_count(queryset)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count'] = {
+            'type': 'integer',
+            'nullable': True,
+        }
+        return response_schema
+
+
+class KeysetOrLimitPagination(BasePagination):
+    """
+    KeysetPagination for requests which opt in with a `cursor` parameter
+    (empty for the first page), LimitPagination with `start` offsets for
+    every other request, so existing clients keep working.
+    """
+    keyset_class = KeysetPagination
+    limit_class = LimitPagination
+
+    def __init__(self):
+        self.paginator = self.limit_class()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.keyset_class.cursor_query_param in request.query_params:
+            self.paginator = self.keyset_class()
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        # the keyset response only differs by a nullable count.
+        return self.keyset_class().get_paginated_response_schema(schema)
+
+    def to_html(self):
+        return self.paginator.to_html()
+
+    @property
+    def display_page_controls(self):
+        return self.paginator.display_page_controls
+
+    def get_schema_operation_parameters(self, view):
+        parameters = self.limit_class().get_schema_operation_parameters(view)
+        names = {parameter['name'] for parameter in parameters}
+        keyset_parameters = self.keyset_class().get_schema_operation_parameters(view)
+        return parameters + [
+            parameter for parameter in keyset_parameters if parameter['name'] not in names
+        ]
@@ -0,0 +1,303 @@
+import socket
+import threading
+import weakref
+from unittest import mock
+
+from aiosmtpd.controller import Controller
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from .batching import BatchWriter, flush_batch_writers
+from .throttling import IPThrottle, throttle_cache
+from .utils import next_sequence_value, unique_order_id_generator
+from ..mail import MailResult, MailTransport, build_message, html_to_text
+from ..sms import FakeBackend, SmsGateway, SmsResult
+
+
+class SequenceTests(TestCase):
+
+    def test_values_count_up(self):
+        self.assertEqual(
+            [next_sequence_value('test_count_up', start=5) for _ in range(3)], [5, 6, 7]
+        )
+
+    def test_sequence_of_a_rolled_back_transaction_is_created_again(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                next_sequence_value('test_rolled_back')
+                raise RuntimeError
+        self.assertEqual(next_sequence_value('test_rolled_back'), 1)
+
+    def test_order_ids_taken_before_the_sequence_are_skipped(self):
+        today = f'{timezone.now():%Y%m%d}'
+        taken = {f'{today}0001', f'{today}0002'}
+
+        class Order:
+            _meta = mock.Mock(label_lower='core.testorder')
+            objects = mock.Mock()
+        Order.objects.filter.side_effect = lambda order_id: mock.Mock(
+            exists=mock.Mock(return_value=order_id in taken)
+        )
+        self.assertEqual(unique_order_id_generator(Order()), f'{today}0003')
+        self.assertEqual(unique_order_id_generator(Order()), f'{today}0004')
+
+
+class HtmlToTextTests(TestCase):
+
+    def test_style_and_script_blocks_are_dropped(self):
+        html = (
+            '<html><head><style type="text/css">p { color: red; }</style></head>'
+            '<body><p>Hello</p><SCRIPT>track();</SCRIPT></body></html>'
+        )
+        self.assertEqual(html_to_text(html), 'Hello')
+
+    def test_entities_are_decoded_after_the_tags_are_stripped(self):
+        html = '<p>Fish &amp; chips&nbsp;for &lt;b&gt;you&lt;/b&gt; &#8212; &quot;now&quot;</p>'
+        self.assertEqual(html_to_text(html), 'Fish & chips\xa0for <b>you</b> \u2014 "now"')
+
+
+class RecordingHandler:
+    """Accepts every mail and records the client address it came from."""
+
+    def __init__(self):
+        self.peers = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.peers.append(session.peer)
+        return '250 OK'
+
+
+class MailTransportTests(TestCase):
+
+    def setUp(self):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            self.port = sock.getsockname()[1]
+        self.handler = RecordingHandler()
+        self.start_server()
+        settings = override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1',
+            EMAIL_PORT=self.port,
+            EMAIL_USE_TLS=False,
+            EMAIL_HOST_USER='',
+            EMAIL_HOST_PASSWORD='',
+            EMAIL_TIMEOUT=5,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.transport = MailTransport()
+        self.addCleanup(self.transport.close)
+
+    def start_server(self):
+        self.server = Controller(self.handler, hostname='127.0.0.1', port=self.port)
+        self.server.start()
+        self.addCleanup(self.stop_server)
+
+    def stop_server(self):
+        if self.server is not None:
+            self.server.stop()
+            self.server = None
+
+    def send(self, *recipients):
+        messages = [build_message('Hello', '<p>Hello</p>', to=[to]) for to in recipients]
+        return self.transport.send_messages(messages)
+
+    def test_messages_share_one_connection(self):
+        self.assertEqual(
+            self.send('one@example.com', 'two@example.com'),
+            [
+                MailResult(['one@example.com'], True, None),
+                MailResult(['two@example.com'], True, None),
+            ]
+        )
+        self.send('three@example.com')
+        self.assertEqual(len(self.handler.peers), 3)
+        self.assertEqual(len(set(self.handler.peers)), 1)
+
+    def test_dropped_connection_is_reopened(self):
+        self.send('one@example.com')
+        # a restart closes the open connection, as an idle timeout would.
+        self.stop_server()
+        self.start_server()
+        with self.assertLogs('{{cookiecutter.repo_name}}.mail', 'INFO'):
+            self.assertEqual(
+                self.send('two@example.com'), [MailResult(['two@example.com'], True, None)]
+            )
+        self.assertEqual(len(self.handler.peers), 2)
+        self.assertNotEqual(self.handler.peers[0], self.handler.peers[1])
+
+    def test_unreachable_server_fails_the_message(self):
+        self.stop_server()
+        with self.assertLogs('{{cookiecutter.repo_name}}.mail', 'ERROR'):
+            [result] = self.send('one@example.com')
+        self.assertFalse(result.sent)
+        self.assertTrue(result.error)
+
+
+class ThrottledView:
+    throttle_scope = 'test'
+
+
+@mock.patch.object(IPThrottle, 'THROTTLE_RATES', {'test.ip': '4/min'})
+class SlidingWindowThrottleTests(TestCase):
+    # 10 minutes in, the start of a fixed window.
+    start = 600.0
+
+    def setUp(self):
+        throttle_cache.down_until = float('inf')
+        throttle_cache.local.data.clear()
+        self.request = Request(APIRequestFactory().get('/', REMOTE_ADDR='10.0.0.1'))
+
+    def check(self, at):
+        throttle = IPThrottle()
+        throttle.timer = lambda: self.start + at
+        return throttle.allow_request(self.request, ThrottledView()), throttle
+
+    def test_full_window_waits_for_its_end(self):
+        for at in range(4):
+            self.assertTrue(self.check(at)[0])
+        allowed, throttle = self.check(15)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(throttle.wait(), 45)
+
+    def test_previous_window_counts_by_its_overlap(self):
+        for _ in range(4):
+            self.assertTrue(self.check(50)[0])
+        # 6 seconds into the next window 90% of the previous one overlaps: 3.6 + 0.
+        self.assertTrue(self.check(66)[0])
+        # 3.6 + 1, allowed again once the previous window weighs less than 3.
+        allowed, throttle = self.check(66)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(throttle.wait(), 9)
+        self.assertTrue(self.check(76)[0])
+
+    def test_windows_before_the_previous_one_are_forgotten(self):
+        for _ in range(4):
+            self.assertTrue(self.check(0)[0])
+        self.assertFalse(self.check(59)[0])
+        self.assertTrue(self.check(120)[0])
+
+
+class FlakyBackend(FakeBackend):
+    """Raises the queued errors, one per publish, before it sends."""
+
+    def __init__(self, *errors):
+        super().__init__()
+        self.errors = list(errors)
+        self.attempts = 0
+
+    def publish(self, phone, message):
+        self.attempts += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        super().publish(phone, message)
+
+
+@override_settings(SMS_RETRIES=2, SMS_RETRY_BACKOFF=0.5, SMS_FAKE_LATENCY=0, SMS_MAX_WORKERS=2)
+class SmsGatewayTests(TestCase):
+
+    def setUp(self):
+        patcher = mock.patch('{{cookiecutter.repo_name}}.sms.time.sleep')
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+        # no jitter, the delays are exact.
+        patcher = mock.patch('{{cookiecutter.repo_name}}.sms.random.uniform', return_value=0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def send(self, backend):
+        gateway = SmsGateway(backend)
+        self.addCleanup(gateway.close)
+        return gateway.send('+15550000001', 'hello')
+
+    def test_temporary_failures_are_retried_with_backoff(self):
+        backend = FlakyBackend(ConnectionError('reset'), TimeoutError('timed out'))
+        self.assertEqual(self.send(backend), SmsResult('+15550000001', True, None))
+        self.assertEqual(backend.attempts, 3)
+        self.assertEqual([call.args[0] for call in self.sleep.call_args_list], [0.5, 1.0])
+        self.assertEqual(list(backend.outbox), [('+15550000001', 'hello')])
+
+    def test_gives_up_after_the_last_retry(self):
+        backend = FlakyBackend(*(ConnectionError('reset') for _ in range(3)))
+        with self.assertLogs('{{cookiecutter.repo_name}}.sms', 'ERROR'):
+            self.assertEqual(self.send(backend), SmsResult('+15550000001', False, 'reset'))
+        self.assertEqual(backend.attempts, 3)
+        self.assertFalse(backend.outbox)
+
+    def test_permanent_failures_are_not_retried(self):
+        backend = FlakyBackend(ValueError('invalid phone'))
+        with self.assertLogs('{{cookiecutter.repo_name}}.sms', 'ERROR'):
+            self.assertEqual(
+                self.send(backend), SmsResult('+15550000001', False, 'invalid phone')
+            )
+        self.assertEqual(backend.attempts, 1)
+        self.sleep.assert_not_called()
+
+    def test_send_many_returns_a_result_per_message(self):
+        gateway = SmsGateway(FlakyBackend(ValueError('invalid phone')))
+        self.addCleanup(gateway.close)
+        messages = [('+15550000001', 'one')]
+        with self.assertLogs('{{cookiecutter.repo_name}}.sms', 'ERROR'):
+            self.assertEqual(
+                gateway.send_many(messages), [SmsResult('+15550000001', False, 'invalid phone')]
+            )
+        messages = [(f'+1555000000{i}', f'message {i}') for i in range(5)]
+        results = gateway.send_many(messages)
+        self.assertEqual(results, [SmsResult(phone, True, None) for phone, _ in messages])
+        self.assertCountEqual(gateway.backend.outbox, messages)
+
+
+class RecordingWriter(BatchWriter):
+
+    def __init__(self, **kwargs):
+        self.batches = []
+        self.written = threading.Event()
+        super().__init__(**kwargs)
+
+    def write_batch(self, batch):
+        self.batches.append(batch)
+        self.written.set()
+
+
+class BatchWriterTests(TestCase):
+
+    def make_writer(self, **kwargs):
+        writer = RecordingWriter(**kwargs)
+        # cancels a running timer.
+        self.addCleanup(writer.flush)
+        return writer
+
+    def test_full_batch_is_written_at_once(self):
+        writer = self.make_writer(batch_size=2, flush_interval=60)
+        writer.add(1)
+        self.assertEqual(writer.batches, [])
+        writer.add(2)
+        self.assertEqual(writer.batches, [[1, 2]])
+        self.assertIsNone(writer.timer)
+
+    def test_pending_items_are_written_after_the_flush_interval(self):
+        writer = self.make_writer(batch_size=10, flush_interval=0.01)
+        writer.add(1)
+        self.assertTrue(writer.written.wait(5))
+        self.assertEqual(writer.batches, [[1]])
+
+    def test_pending_items_are_written_on_shutdown(self):
+        # a registry of its own, other writers of the process are left alone.
+        with mock.patch('{{cookiecutter.repo_name}}.core.batching._writers', weakref.WeakSet()):
+            writer = self.make_writer(batch_size=10, flush_interval=60)
+            writer.add(1)
+            flush_batch_writers()
+            self.assertEqual(writer.batches, [[1]])
+            flush_batch_writers()
+            self.assertEqual(writer.batches, [[1]])
+
+    def test_failed_batch_is_logged(self):
+        writer = self.make_writer(batch_size=1, flush_interval=60)
+        with mock.patch.object(writer, 'write_batch', side_effect=RuntimeError):
+            with self.assertLogs('{{cookiecutter.repo_name}}.core.batching', 'ERROR'):
+                writer.add(1)
+        self.assertEqual(writer.batch, [])
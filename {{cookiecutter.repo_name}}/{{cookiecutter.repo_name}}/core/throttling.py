@@ -0,0 +1,102 @@
+import hashlib
+
+from django.conf import settings
+from rest_framework.throttling import SimpleRateThrottle
+
+from .cache import FallbackCache
+
+throttle_cache = FallbackCache(max_size=settings.THROTTLE_CACHE_LOCAL_SIZE)
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    """
+    Sliding window counter: the count of the previous fixed window is
+    weighted by how much of it still overlaps the sliding window and added
+    to the count of the current one. Two cache round trips per allowed
+    request, one per rejected request.
+
+    The rate is looked up as "<view.throttle_scope>.<key_name>" in
+    DEFAULT_THROTTLE_RATES, so one view can be throttled by IP, phone and
+    username at once:
+
+        @action(..., throttle_scope='otp_resend', throttle_classes=[IPThrottle, PhoneThrottle])
+    """
+    cache = throttle_cache
+    key_name = None
+
+    def __init__(self):
+        # the rate depends on the view, it is resolved in allow_request.
+        pass
+
+    def get_value(self, request):
+        raise NotImplementedError('.get_value() must be overridden')
+
+    def get_cache_key(self, request, view):
+        value = self.get_value(request)
+        if not value:
+            return None
+        # fixed length keys which don't store phone numbers or emails in clear.
+        digest = hashlib.blake2b(str(value).strip().lower().encode(), digest_size=12).hexdigest()
+        return f'throttle:{self.scope}:{digest}'
+
+    def allow_request(self, request, view):
+        self.scope = f"{getattr(view, 'throttle_scope', None)}.{self.key_name}"
+        if self.scope not in self.THROTTLE_RATES:
+            return True
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        window, position = divmod(self.now / self.duration, 1)
+        current_key = f'{self.key}:{int(window)}'
+        previous_key = f'{self.key}:{int(window) - 1}'
+        counts = self.cache.get_many([current_key, previous_key])
+        self.current = counts.get(current_key, 0)
+        self.previous = counts.get(previous_key, 0)
+        self.position = position
+        if self.previous * (1 - position) + self.current >= self.num_requests:
+            return False
+        try:
+            self.cache.incr(current_key)
+        except ValueError:
+            if not self.cache.add(current_key, 1, self.duration * 2):
+                self.cache.incr(current_key)
+        return True
+
+    def wait(self):
+        if self.current < self.num_requests and self.previous:
+            # the weight of the previous window drops until the estimate fits.
+            overlap = (self.num_requests - self.current) / self.previous
+            return max(0, (1 - self.position - overlap) * self.duration)
+        return (1 - self.position) * self.duration
+
+
+class IPThrottle(SlidingWindowThrottle):
+    key_name = 'ip'
+
+    def get_value(self, request):
+        return self.get_ident(request)
+
+
+class DataThrottle(SlidingWindowThrottle):
+    """Keyed by a field of the request body."""
+    field = None
+
+    def get_value(self, request):
+        value = request.data.get(self.field) if hasattr(request.data, 'get') else None
+        return value if isinstance(value, str) else None
+
+
+class PhoneThrottle(DataThrottle):
+    key_name = field = 'phone'
+
+
+class UsernameThrottle(DataThrottle):
+    key_name = field = 'username'
+
+
+class EmailThrottle(DataThrottle):
+    key_name = field = 'email'
@@ -1,12 +1,17 @@
+import itertools
 import os
 import random
+import secrets
 import string
 import uuid
 
 from django.conf import settings
+from django.db import IntegrityError, connection, transaction
 from django.utils import timezone
 from django.utils.text import slugify
 
+from .models import ReservedCode
+
 
 # To get extension from upload file
 def get_filename_exist(file_path):
@@ -29,10 +34,14 @@ def create_token() -> str:
 
 
 def create_otp() -> str:
-    otp = ''
-    for i in range(6):
-        otp += str(random.randint(0, 9))
-    return otp
+    return f'{secrets.randbelow(10 ** 6):06d}'
+
+
+def chunked(iterable, size):
+    """Split any iterable (also generators) into lists of `size` items."""
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
 
 
 def build_absolute_uri(path) -> str:
@@ -40,7 +49,68 @@ def build_absolute_uri(path) -> str:
 
 
 def random_string_generator(size=8, chars=string.ascii_lowercase + string.digits):
-    return ''.join(random.choice(chars) for _ in range(size))
+    return ''.join(secrets.choice(chars) for _ in range(size))
+
+
+def get_namespace(instance, field_name) -> str:
+    return f'{instance._meta.label_lower}.{field_name}'
+
+
+def reserve_code(namespace, value) -> bool:
+    """
+    Atomically claim `value` within `namespace`. Exactly one caller gets
+    True for a value, however many workers race for it.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {ReservedCode._meta.db_table} (namespace, value, created) '
+            f'VALUES (%s, %s, %s) ON CONFLICT DO NOTHING RETURNING id',
+            [namespace, value, timezone.now()]
+        )
+        return cursor.fetchone() is not None
+
+
+def claim_unique_value(instance, field_name, candidates, attempts=10):
+    """
+    First candidate which isn't used by an existing row and could be
+    reserved. `candidates` is an iterator of values, tried in order.
+    """
+    Klass = instance.__class__
+    namespace = get_namespace(instance, field_name)
+    for value in itertools.islice(candidates, attempts):
+        # rows created before reservations existed aren't in ReservedCode.
+        if Klass.objects.filter(**{field_name: value}).exists():
+            continue
+        if reserve_code(namespace, value):
+            return value
+    raise RuntimeError(f"No free {namespace} value after {attempts} attempts.")
+
+
+_known_sequences = set()
+
+
+def next_sequence_value(name, start=1) -> int:
+    """
+    nextval() of a postgres sequence, created on first use. `start` may be
+    a callable, it is only evaluated when the sequence may need creating.
+    """
+    name = f'seq_{slugify(name).replace("-", "_")}'[:63]
+    with connection.cursor() as cursor:
+        if name not in _known_sequences:
+            start = start() if callable(start) else start
+            try:
+                with transaction.atomic():
+                    cursor.execute(
+                        f'CREATE SEQUENCE IF NOT EXISTS '
+                        f'{connection.ops.quote_name(name)} START {int(start)}'
+                    )
+            except IntegrityError:
+                # IF NOT EXISTS isn't race free, another worker just created it.
+                pass
+            # a rolled back transaction takes the new sequence with it.
+            transaction.on_commit(lambda: _known_sequences.add(name))
+        cursor.execute('SELECT nextval(%s)', [name])
+        return cursor.fetchone()[0]
 
 
 def unique_slug_generator(instance, new_slug=None):
@@ -48,72 +118,61 @@ def unique_slug_generator(instance, new_slug=None):
     This is for a Django project and it assumes your instance
     has a model with a slug field and a title character (char) field.
     """
+    slug = new_slug or slugify(instance.name, allow_unicode=True) or "spacium"
 
-    if new_slug is not None:
-        slug = new_slug
-    else:
-        slug = slugify(instance.name, allow_unicode=True)
-    Klass = instance.__class__
-    qs_exists = Klass.objects.filter(slug=slug).exists()
-    if qs_exists:
-        if not slug:
-            new_slug = "spacium-{randstr}".format(
-                randstr=random_string_generator(size=4)
-            )
-        else:
-            new_slug = "{slug}-{id}".format(
-                slug=slug,
-                id=instance.id)
-        return unique_slug_generator(instance, new_slug=new_slug)
-
-    return slug
-
-
-def unique_order_id_generator(instance):
+    def candidates():
+        yield slug
+        while True:
+            yield f"{slug}-{secrets.token_hex(3)}"
+    return claim_unique_value(instance, 'slug', candidates())
+
+
+def unique_order_id_generator(instance, attempts=10):
     """
         This is for a Django project with order_id field.
+        The day followed by a number of a sequence shared by every worker.
+        The sequence never repeats a number, but ids created before it
+        existed can still be taken, those are skipped.
     """
-    day = timezone.now().day
-    month = timezone.now().month
-    year = timezone.now().year
-    number = '0001'
-    order_new_id = f"{year}{month}{day}{number}"
-    qs = instance.__class__.objects.all()
-    if qs.filter(order_id=order_new_id).exists():
-        print("orders:", qs, flush=True)
-        print("first:", qs.last().order_id, flush=True)
-        return int(qs.last().order_id) + 1
-    return order_new_id
+    Klass = instance.__class__
+    name = f'{instance._meta.label_lower}_order_id'
+    for _ in range(attempts):
+        number = next_sequence_value(name)
+        order_id = f"{timezone.now():%Y%m%d}{number:04d}"
+        if not Klass.objects.filter(order_id=order_id).exists():
+            return order_id
+    raise RuntimeError(f"No free {name} value after {attempts} attempts.")
 
 
 def random_referral_code_generator(instance):
-    Klass = instance.__class__
-    new_code = f"{random_string_generator(8)}".upper().replace(" ", "0")
-    qs_exists = Klass.objects.filter(referral_code=new_code).exists()
-    if qs_exists:
-        return random_referral_code_generator(instance)
-    return new_code
+    # no 0/O and 1/I, codes are typed in by hand.
+    chars = ''.join(c for c in string.ascii_uppercase + string.digits if c not in '01IO')
+
+    def candidates():
+        while True:
+            yield random_string_generator(8, chars)
+    return claim_unique_value(instance, 'referral_code', candidates())
 
 
 def product_model_prefix(instance):
     init = instance.quick_category.slug
-    pre_fix = init[0:3]
-    Klass = instance.__class__
-    qs_exists = Klass.objects.filter(product_model_prefix=pre_fix).exists()
-    if qs_exists:
-        pre_fix = random_string_generator(3, init)
-    return pre_fix.upper()
+
+    def candidates():
+        yield init[0:3].upper()
+        while True:
+            yield random_string_generator(3, init or string.ascii_lowercase).upper()
+    return claim_unique_value(instance, 'product_model_prefix', candidates(), attempts=50)
 
 
 def unique_product_id_generator(instance, new_id=None):
-    instance = instance
+    """model numbers count up per category, from 10001 or the last existing one."""
     category = instance.base.category
     Klass = instance.__class__
-    qs = Klass.objects.filter(base__category=category.id)
-    if qs.exists():
-        last = qs.last().model_no
-        last = last.split(category.product_model_prefix, 1)
-        last = int(last[1])
-    else:
-        last = 10000
-    return str(last + 1)
\ No newline at end of file
+
+    def start():
+        last = Klass.objects.filter(base__category=category.id).order_by('id').last()
+        if last is None:
+            return 10001
+        return int(last.model_no.split(category.product_model_prefix, 1)[1]) + 1
+    name = f'{instance._meta.label_lower}_model_no_{category.id}'
+    return str(next_sequence_value(name, start=start))
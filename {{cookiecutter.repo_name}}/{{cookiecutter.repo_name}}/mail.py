@@ -1,13 +1,34 @@
 # this email configurations and utils for sending emails.
+import functools
+import logging
+import os
+import re
+import smtplib
+import socket
+import threading
+from collections import namedtuple
+from html import unescape
 
+from celery.signals import worker_process_shutdown
 from django.conf import settings
-from django.core.mail import EmailMessage
+from django.core.mail import EmailMultiAlternatives, get_connection
 from django.forms.fields import EmailField
+from django.template import TemplateDoesNotExist
 from django.template.loader import get_template
+from django.utils.html import strip_tags
 
 SENDER = getattr(settings, "DEFAULT_FROM_EMAIL", '{{cookiecutter.repo_name}} <no-reply@{{cookiecutter.repo_name}}.com>')
 CHARSET = "UTF-8"
 
+logger = logging.getLogger(__name__)
+
+MailResult = namedtuple('MailResult', ['recipients', 'sent', 'error'])
+
+# blocks whose content isn't text, strip_tags would keep it.
+NON_TEXT_BLOCKS = re.compile(
+    r'<(style|script)\b[^>]*>.*?</\1\s*>', re.IGNORECASE | re.DOTALL
+)
+
 
 def get_cleaned_emails(emails):
     cleaned_emails = []
@@ -17,7 +38,7 @@ def get_cleaned_emails(emails):
             e.clean(email)
             cleaned_emails.append(email)
         except Exception as ex:
-            print("Invalid Email", ex, email)
+            logger.warning("Invalid email %s: %s", email, ex)
     return cleaned_emails
 
 
@@ -26,32 +47,144 @@ def divide_chunks(recipient, n):
         yield recipient[i : i + n]
 
 
-def send_mail(subject, body, recipient, attachments=[], attachments_files={}, bcc=False):
+class MailTransport:
+    """
+    Keeps one SMTP connection open per worker process and sends every
+    message over it. A dropped connection is reopened and the message is
+    retried once.
+    """
+
+    def __init__(self):
+        self.pid = None
+        self.connection = None
+        self.lock = threading.Lock()
+
+    def _connect(self):
+        if self.connection is None or self.pid != os.getpid():
+            # a connection inherited from the parent process can't be shared.
+            self.connection = get_connection()
+            self.pid = os.getpid()
+        self.connection.open()
+        return self.connection
+
+    def close(self):
+        with self.lock:
+            if self.connection is not None and self.pid == os.getpid():
+                self.connection.close()
+            self.connection = None
+
+    def _send(self, message):
+        try:
+            return self._connect().send_messages([message])
+        except (smtplib.SMTPServerDisconnected, ConnectionError, socket.timeout):
+            logger.info("SMTP connection lost, reconnecting.")
+            self.connection.close()
+            return self._connect().send_messages([message])
+
+    def send_messages(self, messages):
+        """Send messages over the shared connection, one MailResult per message."""
+        results = []
+        with self.lock:
+            for message in messages:
+                recipients = message.recipients()
+                try:
+                    sent = bool(self._send(message))
+                    results.append(MailResult(recipients, sent, None))
+                except Exception as e:
+                    logger.exception("Failed to send mail to %s", recipients)
+                    results.append(MailResult(recipients, False, str(e)))
+        return results
+
+
+transport = MailTransport()
+
+
+@worker_process_shutdown.connect
+def close_mail_transport(*args, **kwargs):
+    transport.close()
+
+
+@functools.lru_cache(maxsize=64)
+def get_compiled_template(template):
+    """Templates are compiled once per worker process."""
+    return get_template(template)
+
+
+@functools.lru_cache(maxsize=64)
+def get_text_template(template):
+    """Plain text version of an html template (name.txt next to name.html), if any."""
+    try:
+        return get_template(f"{os.path.splitext(template)[0]}.txt")
+    except TemplateDoesNotExist:
+        return None
+
+
+def html_to_text(html):
+    # entities are decoded after the tags are gone, "&lt;b&gt;" stays text.
+    text = unescape(strip_tags(NON_TEXT_BLOCKS.sub('', html)))
+    return re.sub(r'\n\s*\n+', '\n\n', text).strip()
+
+
+def render_mail(template, context):
+    """Render a mail template, returns (text, html)."""
+    html = get_compiled_template(template).render(context)
+    text_template = get_text_template(template)
+    text = text_template.render(context) if text_template else html_to_text(html)
+    return text, html
+
+
+def render_many(template, contexts):
+    """Render one template for many contexts, returns a (text, html) pair per context."""
+    return [render_mail(template, context) for context in contexts]
+
+
+def build_message(subject, html, to=None, bcc=None, text=None, attachments=None,
+                  attachments_files=None):
+    """multipart/alternative message with a text and an html part."""
+    msg = EmailMultiAlternatives(
+        subject,
+        text if text is not None else html_to_text(html),
+        from_email=SENDER,
+        to=to,
+        bcc=bcc
+    )
+    msg.attach_alternative(html, "text/html")
+
+    for attachment in attachments or []:
+        msg.attach_file(attachment, mimetype="application/octet-stream")
+
+    for name, attachment in (attachments_files or {}).items():
+        msg.attach(name, attachment, mimetype="application/octet-stream")
+    return msg
+
+
+def send_mail(subject, body, recipient, attachments=[], attachments_files={}, bcc=False,
+              text_body=None):
     recipient = recipient if type(recipient) == list else [recipient]
     recipient = get_cleaned_emails(recipient)
+    messages = []
     for chunk in divide_chunks(recipient, 50):
-        print("sending mail to chunk", chunk, bcc, SENDER)
         to_args = {}
         if bcc:
             to_args["bcc"] = chunk
         else:
             to_args["to"] = chunk
-        msg = EmailMessage(
-            subject, body, from_email=SENDER, **to_args
-        )
-
-        for attachment in attachments:
-            msg.attach_file(attachment, mimetype="application/octet-stream")
-
-        for name, attachment in attachments_files.items():
-            msg.attach(name, attachment, mimetype="application/octet-stream")
-
-        msg.content_subtype = "html"
-        try:
-            msg.send()
-            print("Successful")
-        except Exception as e:
-            print(e, flush=True)
+        messages.append(build_message(
+            subject,
+            body,
+            text=text_body,
+            attachments=attachments,
+            attachments_files=attachments_files,
+            **to_args
+        ))
+    results = transport.send_messages(messages)
+    logger.info(
+        "Sent %s of %s mails for '%s'",
+        sum(result.sent for result in results),
+        len(results),
+        subject
+    )
+    return results
 
 
 def send_mail_from_template(
@@ -62,7 +195,5 @@ def send_mail_from_template(
     attachments=[],
     bcc=False
 ):
-    template = get_template(template)
-    context = context_data
-    body = template.render(context)
-    send_mail(subject, body, recipient_list, attachments, bcc=bcc)
+    text, html = render_mail(template, context_data)
+    return send_mail(subject, html, recipient_list, attachments, bcc=bcc, text_body=text)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.0/ref/settings/
 """
 
+import sys
 from pathlib import Path
 
 from decouple import config
@@ -29,11 +30,17 @@ SITE_URL = config('SITE_URL', 'http://127.0.0.1:8000')
 WEBSITE_URL = config('WEBSITE_URL', SITE_URL)
 # Email Configuration
 SENDGRID_API_KEY = config('SENDGRID_API_KEY')
-EMAIL_HOST = 'smtp.sendgrid.net'
-EMAIL_HOST_USER = 'apikey'  # this is exactly the value 'apikey'
+EMAIL_HOST = config('EMAIL_HOST', 'smtp.sendgrid.net')
+# for sendgrid this is exactly the value 'apikey'.
+EMAIL_HOST_USER = config('EMAIL_HOST_USER', 'apikey')
 EMAIL_HOST_PASSWORD = SENDGRID_API_KEY
-EMAIL_PORT = 587
-EMAIL_USE_TLS = True
+EMAIL_PORT = config('EMAIL_PORT', 587, cast=int)
+EMAIL_USE_TLS = config('EMAIL_USE_TLS', True, cast=bool)
+# seconds, the connection is kept open per worker.
+EMAIL_TIMEOUT = config('EMAIL_TIMEOUT', 30, cast=int)
+# recipients per celery task, and the idle seconds after which a campaign can be resumed.
+MAIL_CAMPAIGN_CHUNK_SIZE = config('MAIL_CAMPAIGN_CHUNK_SIZE', 200, cast=int)
+MAIL_CAMPAIGN_STALE_AFTER = config('MAIL_CAMPAIGN_STALE_AFTER', 3600, cast=int)
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', '{{cookiecutter.repo_name}} <no-reply@{{cookiecutter.repo_name}}.com>')
 
 # firebase config
@@ -57,6 +64,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'django_filters',
     'corsheaders',
     'rest_framework',
@@ -69,6 +77,7 @@ INSTALLED_APPS = [
 # OWN Crated APPS
 
 OWN_APPS = [
+    '{{cookiecutter.repo_name}}.core',
     '{{cookiecutter.repo_name}}.account',
 
 ]
@@ -85,6 +94,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    '{{cookiecutter.repo_name}}.account.middleware.ActivityMiddleware',
 ]
 # CORS ORIGIN
 CORS_ORIGIN_WHITELIST = [
@@ -134,7 +144,7 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework.authentication.BasicAuthentication',
         # 'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.TokenAuthentication',
+        '{{cookiecutter.repo_name}}.account.authentication.CachedTokenAuthentication',
     ),
     # 'DEFAULT_PERMISSION_CLASSES': (
     #     'rest_framework.permissions.IsAuthenticatedOrReadOnly',
@@ -148,8 +158,39 @@ REST_FRAMEWORK = {
     # 'PAGE_SIZE': (
     #     20
     # )
+    # "<throttle_scope>.<ip|phone|username|email>", see core.throttling.
+    'DEFAULT_THROTTLE_RATES': {
+        'sign_in.ip': config('THROTTLE_SIGN_IN_IP', '30/min'),
+        'sign_in.username': config('THROTTLE_SIGN_IN_USERNAME', '10/min'),
+        'otp_verify.ip': config('THROTTLE_OTP_VERIFY_IP', '30/min'),
+        'otp_verify.phone': config('THROTTLE_OTP_VERIFY_PHONE', '5/min'),
+        'otp_resend.ip': config('THROTTLE_OTP_RESEND_IP', '10/hour'),
+        'otp_resend.phone': config('THROTTLE_OTP_RESEND_PHONE', '3/hour'),
+        'email_resend.ip': config('THROTTLE_EMAIL_RESEND_IP', '10/hour'),
+        'email_resend.email': config('THROTTLE_EMAIL_RESEND_EMAIL', '3/hour'),
+    },
+}
+
 
+# Cache
+# Redis is shared with celery; short socket timeouts let callers fall back quickly.
+REDIS_URL = config(
+    'REDIS_URL', 'redis://localhost:6379/0?socket_connect_timeout=0.5&socket_timeout=0.5'
+)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    }
 }
+TOKEN_CACHE_TIMEOUT = config('TOKEN_CACHE_TIMEOUT', 300, cast=int)  # seconds
+TOKEN_CACHE_LOCAL_SIZE = config('TOKEN_CACHE_LOCAL_SIZE', 10000, cast=int)
+THROTTLE_CACHE_LOCAL_SIZE = config('THROTTLE_CACHE_LOCAL_SIZE', 100000, cast=int)
+# User.last_active_on is written at most once per interval, in batched UPDATEs.
+ACTIVITY_UPDATE_INTERVAL = config('ACTIVITY_UPDATE_INTERVAL', 300, cast=int)  # seconds
+ACTIVITY_FLUSH_INTERVAL = config('ACTIVITY_FLUSH_INTERVAL', 10, cast=int)  # seconds
+ACTIVITY_BATCH_SIZE = config('ACTIVITY_BATCH_SIZE', 500, cast=int)  # users per UPDATE
+ACTIVITY_CACHE_LOCAL_SIZE = config('ACTIVITY_CACHE_LOCAL_SIZE', 100000, cast=int)
 
 
 # Password validation
@@ -170,6 +211,22 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# the first hasher hashes new passwords, the others still verify old hashes
+# which are upgraded on the next successful login.
+PASSWORD_HASHERS = [
+    '{{cookiecutter.repo_name}}.account.hashers.TunedArgon2PasswordHasher',
+    '{{cookiecutter.repo_name}}.account.hashers.TunedScryptPasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+# tune with `manage.py benchmark_hashers` on the production hardware.
+ARGON2_TIME_COST = config('ARGON2_TIME_COST', 2, cast=int)
+ARGON2_MEMORY_COST = config('ARGON2_MEMORY_COST', 102400, cast=int)  # KiB
+ARGON2_PARALLELISM = config('ARGON2_PARALLELISM', 8, cast=int)
+SCRYPT_WORK_FACTOR = config('SCRYPT_WORK_FACTOR', 2 ** 14, cast=int)
+# processes hashing passwords for the web workers, 0 hashes on the request thread.
+PASSWORD_HASHING_WORKERS = config('PASSWORD_HASHING_WORKERS', 0, cast=int)
+PASSWORD_HASHING_MAX_PENDING = config('PASSWORD_HASHING_MAX_PENDING', 32, cast=int)
 
 # Internationalization
 # https://docs.djangoproject.com/en/4.0/topics/i18n/
@@ -199,6 +256,16 @@ DEFAULT_FILE_STORAGE = 'storages.backends.s3boto3.S3Boto3Storage'
 # STATICFILES_STORAGE = 'storages.backends.s3boto3.S3Boto3Storage'
 AWS_QUERYSTRING_AUTH = False
 
+# SMS
+# {{cookiecutter.repo_name}}.sms.SNSBackend, or {{cookiecutter.repo_name}}.sms.FakeBackend which
+# keeps the messages in memory.
+SMS_BACKEND = config('SMS_BACKEND', '{{cookiecutter.repo_name}}.sms.SNSBackend')
+AWS_SNS_REGION_NAME = config('REGION_NAME', None)
+SMS_MAX_WORKERS = config('SMS_MAX_WORKERS', 10, cast=int)  # concurrent sends of send_many
+SMS_RETRIES = config('SMS_RETRIES', 3, cast=int)
+SMS_RETRY_BACKOFF = config('SMS_RETRY_BACKOFF', 0.5, cast=float)  # seconds, doubled per retry
+SMS_FAKE_LATENCY = config('SMS_FAKE_LATENCY', 0, cast=float)  # seconds per fake send
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.0/ref/settings/#default-auto-field
 
@@ -264,6 +331,44 @@ LOGGING = {
 }
 
 
+# Celery
+# eager mode runs every task in-process, for tests and local development.
+# tasks queued with transaction.on_commit still wait for the commit.
+CELERY_TASK_ALWAYS_EAGER = config('CELERY_TASK_ALWAYS_EAGER', False, cast=bool)
+CELERY_TASK_EAGER_PROPAGATES = CELERY_TASK_ALWAYS_EAGER
+
 # Global Variable
 
-OTP_TIME_OUT = 5
+OTP_TIME_OUT = 5  # minutes
+OTP_MAX_ATTEMPTS = config('OTP_MAX_ATTEMPTS', 5, cast=int)
+
+# Audit History
+# sync, buffer or celery. Tests write synchronously, buffered entries would
+# outlive the test's transaction.
+TESTING = sys.argv[1:2] == ['test']
+HISTORY_WRITER = config('HISTORY_WRITER', 'sync' if TESTING else 'buffer')
+HISTORY_BATCH_SIZE = config('HISTORY_BATCH_SIZE', 100, cast=int)
+HISTORY_FLUSH_INTERVAL = config('HISTORY_FLUSH_INTERVAL', 5, cast=int)  # seconds
+HISTORY_BUFFER_SIZE = config('HISTORY_BUFFER_SIZE', 10000, cast=int)
+# request.META keys stored with every history row, the user agent is
+# stored separately in the UserAgent lookup table.
+HISTORY_HEADERS = [
+    'REMOTE_ADDR',
+    'HTTP_X_FORWARDED_FOR',
+    'HTTP_X_REAL_IP',
+    'HTTP_REFERER',
+    'HTTP_ACCEPT_LANGUAGE',
+]
+HISTORY_HEADER_MAX_LENGTH = config('HISTORY_HEADER_MAX_LENGTH', 200, cast=int)
+# monthly history partitions, maintained by `manage.py history_partitions`.
+HISTORY_PARTITIONS_AHEAD = config('HISTORY_PARTITIONS_AHEAD', 3, cast=int)
+HISTORY_RETENTION_MONTHS = config('HISTORY_RETENTION_MONTHS', 12, cast=int)
+HISTORY_ARCHIVE_DIR = config('HISTORY_ARCHIVE_DIR', '')
+
+# Bulk user operations (bulk-delete, bulk-deactivate)
+# users per UPDATE and transaction.
+BULK_USER_CHUNK_SIZE = config('BULK_USER_CHUNK_SIZE', 500, cast=int)
+# more ids, or any filter, run in celery.
+BULK_USER_SYNC_LIMIT = config('BULK_USER_SYNC_LIMIT', 1000, cast=int)
+# seconds the job progress is kept.
+BULK_USER_JOB_TIMEOUT = config('BULK_USER_JOB_TIMEOUT', 86400, cast=int)
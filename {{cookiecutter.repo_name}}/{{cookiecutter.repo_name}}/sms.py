@@ -1,16 +1,156 @@
-import boto3
-from decouple import config
+# this sms configurations and utils for sending sms.
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 
-client = boto3.client(
-    "sns",
-    aws_access_key_id=config('AWS_ACCESS_KEY_ID'),
-    aws_secret_access_key=config('AWS_SECRET_ACCESS_KEY'),
-    region_name=config('REGION_NAME')
-)
+from celery.signals import worker_process_shutdown
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+SmsResult = namedtuple('SmsResult', ['phone', 'sent', 'error'])
+
+
+class BaseSmsBackend:
+
+    def publish(self, phone, message):
+        raise NotImplementedError('.publish() must be overridden')
+
+    def is_retryable(self, error):
+        return isinstance(error, (ConnectionError, TimeoutError))
+
+
+class SNSBackend(BaseSmsBackend):
+    """
+    Amazon SNS. The client is created on first use and once per process,
+    boto3 clients are thread safe so the send threads share it.
+    """
+    retryable_codes = {
+        'Throttling',
+        'ThrottlingException',
+        'InternalError',
+        'InternalFailure',
+        'ServiceUnavailable',
+    }
+
+    def __init__(self):
+        self.client = None
+        self.pid = None
+        self.lock = threading.Lock()
+
+    def get_client(self):
+        with self.lock:
+            if self.client is None or self.pid != os.getpid():
+                import boto3
+                from botocore.config import Config
+                self.client = boto3.client(
+                    "sns",
+                    aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+                    aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+                    region_name=settings.AWS_SNS_REGION_NAME,
+                    config=Config(
+                        max_pool_connections=settings.SMS_MAX_WORKERS,
+                        # retries are done by SmsGateway.
+                        retries={'total_max_attempts': 1}
+                    )
+                )
+                self.pid = os.getpid()
+            return self.client
+
+    def publish(self, phone, message):
+        self.get_client().publish(PhoneNumber=phone, Message=message)
+
+    def is_retryable(self, error):
+        from botocore.exceptions import ClientError, ConnectionError as BotoConnectionError
+        if isinstance(error, ClientError):
+            return error.response.get('Error', {}).get('Code') in self.retryable_codes
+        return isinstance(error, BotoConnectionError) or super().is_retryable(error)
+
+
+class FakeBackend(BaseSmsBackend):
+    """Keeps the latest messages in `outbox` instead of sending them, for
+    tests and offline throughput checks. SMS_FAKE_LATENCY simulates the network."""
+
+    def __init__(self):
+        self.outbox = deque(maxlen=10000)
+        self.latency = settings.SMS_FAKE_LATENCY
+
+    def publish(self, phone, message):
+        if self.latency:
+            time.sleep(self.latency)
+        self.outbox.append((phone, message))
+
+
+class SmsGateway:
+    """
+    Send sms through the SMS_BACKEND, retrying temporary failures with
+    exponential backoff. send_many() sends concurrently from a thread pool
+    which, like the backend, is reused by every call of the process.
+    """
+
+    def __init__(self, backend=None):
+        self._backend = backend
+        self.pool = None
+        self.pid = None
+        self.lock = threading.Lock()
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = import_string(settings.SMS_BACKEND)()
+        return self._backend
+
+    def get_pool(self):
+        with self.lock:
+            if self.pool is None or self.pid != os.getpid():
+                # threads don't survive a fork.
+                self.pool = ThreadPoolExecutor(
+                    max_workers=settings.SMS_MAX_WORKERS, thread_name_prefix='sms'
+                )
+                self.pid = os.getpid()
+            return self.pool
+
+    def close(self):
+        with self.lock:
+            if self.pool is not None and self.pid == os.getpid():
+                self.pool.shutdown()
+            self.pool = None
+
+    def send(self, phone, message):
+        for attempt in range(settings.SMS_RETRIES + 1):
+            try:
+                self.backend.publish(phone, message)
+                return SmsResult(phone, True, None)
+            except Exception as e:
+                if attempt == settings.SMS_RETRIES or not self.backend.is_retryable(e):
+                    logger.exception("Failed to send sms to %s", phone)
+                    return SmsResult(phone, False, str(e))
+                delay = settings.SMS_RETRY_BACKOFF * 2 ** attempt
+                time.sleep(delay + random.uniform(0, delay))
+
+    def send_many(self, messages):
+        """Send (phone, message) pairs concurrently, one SmsResult per pair."""
+        results = list(self.get_pool().map(lambda item: self.send(*item), messages))
+        logger.info("Sent %s of %s sms", sum(result.sent for result in results), len(results))
+        return results
+
+
+gateway = SmsGateway()
+
+
+@worker_process_shutdown.connect
+def close_sms_gateway(*args, **kwargs):
+    gateway.close()
+
+
+def get_otp_message(otp):
+    return f"{otp} is your '{{cookiecutter.repo_name}}' verification code."
 
 
 def send_otp(phone, otp):
-    client.publish(
-        PhoneNumber=phone,
-        Message=f"{otp} is your '{{cookiecutter.repo_name}}' verification code."
-    )
+    return gateway.send(phone, get_otp_message(otp))